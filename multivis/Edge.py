@@ -1,6 +1,10 @@
+import os
 import sys
 import pandas as pd
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from .utils import lazyMatrix, sparseMatrix
+from .utils.edgeCache import _fingerprint, _loadCache, _saveCache
 
 class Edge:
     usage = """Builds nodes and edges and is the base class for the Network class.
@@ -8,8 +12,10 @@ class Edge:
         Initial_Parameters
         ----------
         peaktable : Pandas dataframe containing peak data. Must contain 'Name' and 'Label'.
-        datatable : Pandas dataframe matrix containing scores
-        pvalues : Pandas dataframe matrix containing score/similarity pvalues (if available, otherwise set to None)
+        datatable : Pandas dataframe matrix containing scores (or a lazyMatrix handle to scores on disk, read tile by tile, or a sparseMatrix handle to a scipy.sparse matrix, of which only the stored entries are read). Can also be a dictionary of rectangular matrices between blocks, as returned by crossCorrAnalysis.
+        pvalues : Pandas dataframe matrix containing score/similarity pvalues (if available, otherwise set to None). Can also be a lazyMatrix or sparseMatrix handle, or a dictionary of rectangular matrices with the same keys as the datatable.
+
+        The datatable can also be a long table of pairs with 'start_name', 'end_name', 'score' and optionally 'pvalue' columns, as returned by corrAnalysis with a threshold. In this case pvalues is set to None.
 
         Methods
         -------
@@ -18,12 +24,20 @@ class Edge:
             hard_threshold: Value to filter the data on (default: 0.005)
             withinBlocks: Include scores within blocks if building multi-block network (default: False)
             sign: The sign of the score/similarity to filter on ('pos', 'neg' or 'both') (default: 'both')
+            compact: Build a compact edge table, with int32 node indexes, float32 scores/pvalues, an int8 sign and categorical names, labels and blocks (default: False)
+            n_jobs: The number of threads to build the edges of each pair of blocks with. Setting to -1 uses all cores (default: 1)
+            cache_dir: A directory to cache built nodes and edges in, keyed by a fingerprint of the peak table, matrices and parameters, so an unchanged build is loaded from disk (default: None, no caching)
+            cache_size: The maximum size of the cache directory in MB. The least recently used entries are removed beyond it (default: 1024)
 
         help : Print this help text
 
         build : Builds the nodes and edges.
         getNodes : Returns a Pandas dataframe of all nodes.
         getEdges : Returns a Pandas dataframe of all edges.
+        getEdgesAtThreshold : Returns a Pandas dataframe of the edges passing a hard threshold (and optionally filter type), without rebuilding.
+        getThresholdCurve : Returns a Pandas dataframe of the number of edges and network density (of the possible edges between the block pairs built) passing each of a list of thresholds.
+        iterEdges : Builds the nodes and yields the edges in Pandas dataframe batches of up to chunk_size matrix rows (default: all rows of a dataframe, or rows of ~64MB of each block of a lazyMatrix, read from that block's columns only), without holding all edges. The scores and pvalues are each read one tile at a time.
+        writeEdges : Builds the nodes and writes the edges batch by batch to a .csv file, or a .parquet file (requires pyarrow).
     """
 
     def __init__(self, peaktable, datatable, pvalues):
@@ -34,7 +48,17 @@ class Edge:
         if pvalues is not None:
             pvalues = self.__checkData(pvalues)
 
-        peaktable, datatable, pvalues = self.__checkDataIntersect(peaktable, datatable, pvalues)
+        if isinstance(datatable, sparseMatrix):
+            # Only the stored entries of a sparse matrix are read, as a table of pairs
+            datatable = datatable.toPairs(pvalues)
+            pvalues = None
+
+        if self.__isPairTable(datatable):
+            peaktable, datatable, pvalues = self.__checkPairIntersect(peaktable, datatable, pvalues)
+        elif isinstance(datatable, dict):
+            peaktable, datatable, pvalues = self.__checkPanelIntersect(peaktable, datatable, pvalues)
+        else:
+            peaktable, datatable, pvalues = self.__checkDataIntersect(peaktable, datatable, pvalues)
 
         self.__peaktable = peaktable
         self.__datatable = datatable
@@ -43,107 +67,388 @@ class Edge:
         self.__setNodes(pd.DataFrame())
         self.__setEdges(pd.DataFrame())
 
+        self.__candidates = None
+        self.__candidateIndex = {}
+
         self.set_params()
 
     def help(self):
         print(Edge.usage)
 
-    def set_params(self, filter_type='pvalue', hard_threshold=0.005, withinBlocks=False, sign='both'):
+    def set_params(self, filter_type='pvalue', hard_threshold=0.005, withinBlocks=False, sign='both', compact=False, n_jobs=1, cache_dir=None, cache_size=1024):
 
-        filter_type, hard_threshold, withinBlocks, sign = self.__paramCheck(filter_type, hard_threshold, withinBlocks,
-                                                                            sign)
+        filter_type, hard_threshold, withinBlocks, sign, compact, n_jobs = self.__paramCheck(filter_type, hard_threshold,
+                                                                                             withinBlocks, sign, compact,
+                                                                                             n_jobs)
 
         self.__filter_type = filter_type;
         self.__hard_threshold = hard_threshold;
         self.__withinBlocks = withinBlocks;
         self.__sign = sign;
+        self.__compact = compact;
+        self.__n_jobs = n_jobs;
+
+        self.__cache_dir, self.__cache_size = self.__cacheCheck(cache_dir, cache_size)
 
     def build(self):
 
+        if self.__cache_dir is not None:
+            # The parameters that change the nodes and edges are fingerprinted with the data
+            key = _fingerprint(self.__peaktable, self.__datatable, self.__pvalues, self.__filter_type.lower(),
+                               float(self.__hard_threshold), self.__withinBlocks, self.__sign.lower(), self.__compact)
+
+            cached = _loadCache(self.__cache_dir, key)
+
+            if cached is not None:
+                nodes, edges = cached
+            else:
+                nodes, edges = self.__buildNodesEdges(self.__filter_type, self.__hard_threshold, self.__sign)
+
+                _saveCache(self.__cache_dir, key, nodes, edges, self.__cache_size)
+        else:
+            nodes, edges = self.__buildNodesEdges(self.__filter_type, self.__hard_threshold, self.__sign)
+
+        self.__setNodes(nodes)
+        self.__setEdges(edges)
+
+    def getNodes(self):
+
+        return self.__nodes
+
+    def getEdges(self):
+
+        return self.__edges
+
+    def getEdgesAtThreshold(self, hard_threshold, filter_type=None):
+
+        filter_type, hard_threshold, _, _, _, _ = self.__paramCheck(filter_type or self.__filter_type, hard_threshold,
+                                                                    self.__withinBlocks, self.__sign, self.__compact,
+                                                                    self.__n_jobs)
+
+        order, values, filter_type = self.__thresholdIndex(filter_type, self.__sign)
+
+        rows = np.sort(order[:self.__passCount(values, filter_type, hard_threshold)])
+
+        # Only the edges passing are built into a table
+        nodes, blocks, start_pos, end_pos, score, pval, _, _ = self.__candidates
+
+        return self.__positionEdges(nodes, blocks, start_pos[rows].astype(np.intp), end_pos[rows].astype(np.intp),
+                                    score[rows], pval[rows] if pval is not None else None)
+
+    def getThresholdCurve(self, thresholds, filter_type=None):
+
+        filter_type, _, _, _, _, _ = self.__paramCheck(filter_type or self.__filter_type, 0, self.__withinBlocks,
+                                                       self.__sign, self.__compact, self.__n_jobs)
+
+        order, values, filter_type = self.__thresholdIndex(filter_type, self.__sign)
+
+        thresholds = np.asarray(thresholds, dtype=float).ravel()
+        counts = np.array([self.__passCount(values, filter_type, threshold) for threshold in thresholds])
+
+        possible = self.__candidates[6]
+
+        return pd.DataFrame({'threshold': thresholds, 'edges': counts,
+                             'density': counts / possible if possible > 0 else np.zeros(len(counts))})
+
+    def iterEdges(self, chunk_size=None):
+
+        chunk_size = self.__chunkCheck(chunk_size)
+
+        filter_type, hard_threshold, sign = self.__filter_type, self.__hard_threshold, self.__sign
+
+        if self.__isPairTable(self.__datatable):
+            # A table of pairs is already held in memory, so its edges are a single batch
+            nodes, edges = self.__buildPairEdges(self.__peaktable, self.__datatable, filter_type, hard_threshold, sign)
+
+            self.__setNodes(nodes)
+
+            yield edges
+            return
+
+        nodes, tasks = self.__blockPairTasks(filter_type)
+
+        self.__setNodes(nodes)
+
+        for datatable, pvalues, index_block, column_block, rows, columns, panel_filter_type in tasks:
+
+            SCORE = self.__blockSlice(datatable, rows, columns)
+            PVAL = self.__blockSlice(pvalues, rows, columns) if pvalues is not None else None
+
+            yield from self.__buildEdgeBatches(nodes, SCORE, PVAL, index_block, column_block, panel_filter_type,
+                                               hard_threshold, sign, chunk_size)
+
+    def writeEdges(self, filename, chunk_size=None):
+
+        if not isinstance(filename, str) or not filename.lower().endswith(('.csv', '.parquet')):
+            print("Error: The file name is not valid. Choose a \".csv\" or \".parquet\" file.")
+            sys.exit()
+
+        parquet = filename.lower().endswith('.parquet')
+
+        if parquet:
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                print("Error: Writing \".parquet\" files requires pyarrow. Please install pyarrow, or choose a \".csv\" file.")
+                sys.exit()
+
+        writer = None
+        n_batches = 0
+        edges = pd.DataFrame()
+
+        for edges in self.iterEdges(chunk_size):
+
+            # Empty batches are skipped, so every batch written has the column types of the first
+            if edges.empty:
+                continue
+
+            if parquet:
+                table = pa.Table.from_pandas(edges, preserve_index=False)
+
+                if writer is None:
+                    writer = pq.ParquetWriter(filename, table.schema)
+
+                writer.write_table(table)
+            else:
+                edges.to_csv(filename, mode='w' if n_batches == 0 else 'a', header=n_batches == 0, index=False)
+
+            n_batches += 1
+
+        if writer is not None:
+            writer.close()
+
+        if n_batches == 0:
+            # Without any edges, the file holds the columns only
+            if parquet:
+                edges.to_parquet(filename, index=False)
+            else:
+                edges.to_csv(filename, index=False)
+
+    def __buildNodesEdges(self, filter_type, hard_threshold, sign):
+
         peaktable = self.__peaktable
         datatable = self.__datatable
-        pvalues = self.__pvalues
 
-        filter_type = self.__filter_type
-        hard_threshold = self.__hard_threshold
-        sign = self.__sign
+        if self.__isPairTable(datatable):
+            # A long table of pairs (e.g. from corrAnalysis with a threshold) is built directly, without a matrix
+            return self.__buildPairEdges(peaktable, datatable, filter_type, hard_threshold, sign)
+
+        nodes, tasks = self.__blockPairTasks(filter_type)
+
+        def __buildBlockPair(task):
+
+            datatable, pvalues, index_block, column_block, rows, columns, panel_filter_type = task
+
+            SCORE = self.__blockSlice(datatable, rows, columns)
+            PVAL = self.__blockSlice(pvalues, rows, columns) if pvalues is not None else None
+
+            return self.__buildEdges(nodes, SCORE, PVAL, index_block, column_block, panel_filter_type, hard_threshold,
+                                     sign)
+
+        # The block pairs only read the shared matrices, so they are built in threads without copying the data
+        if self.__n_jobs == 1 or len(tasks) < 2:
+            block_edges = [__buildBlockPair(task) for task in tasks]
+        else:
+            with ThreadPoolExecutor(max_workers=self.__n_jobs) as pool:
+                block_edges = list(pool.map(__buildBlockPair, tasks))
+
+        return nodes, self.__joinEdges(block_edges)
+
+    def __blockPairTasks(self, filter_type):
+        # Lists the (block, block) pairs of every panel to build edges for, with the positions of their rows and columns
+
+        peaktable = self.__peaktable
+        datatable = self.__datatable
+        pvalues = self.__pvalues
 
         nodes = pd.DataFrame();
-        edges = pd.DataFrame();
 
-        if 'Block' in peaktable.columns:
-            index_blocks = peaktable[peaktable['Name'].isin(list(datatable.index))].Block.unique()
-            column_blocks = peaktable[peaktable['Name'].isin(list(datatable.columns))].Block.unique()
+        if isinstance(datatable, dict):
+            # Rectangular panels (e.g. from crossCorrAnalysis) are each built as a rectangular matrix
+            panels = [(datatable[key], pvalues[key] if pvalues is not None else None) for key in datatable]
         else:
-            index_blocks = ['#no_multiple_blocks']
-            column_blocks = ['#no_multiple_blocks']
+            panels = [(datatable, pvalues)]
+
+        tasks = []
 
-        for idx, index_block in enumerate(index_blocks):
+        for datatable, pvalues in panels:
 
-            nodes, scoreBlocks_index, pvalBlocks_index = self.__scoreBlockIndex(nodes, peaktable, datatable, pvalues,
-                                                                                index_blocks, index_block)
+            if 'Block' in peaktable.columns:
+                index_blocks = peaktable[peaktable['Name'].isin(list(datatable.index))].Block.unique()
+                column_blocks = peaktable[peaktable['Name'].isin(list(datatable.columns))].Block.unique()
+            else:
+                index_blocks = ['#no_multiple_blocks']
+                column_blocks = ['#no_multiple_blocks']
 
             if set(list(datatable.index)) == set(list(datatable.columns)):
-                iter_idx = idx;
+                square = True;
             else:
-                iter_idx = 0;
-
-            for column_block in column_blocks[iter_idx:]:
-
-                if pvalues is None:
-                    filter_type = 'score';
-
-                if self.__withinBlocks:
-
-                    nodes, scoreBlocks_column, pvalBlocks_column = self.__scoreBlockColumn(nodes, peaktable,
-                                                                                           scoreBlocks_index,
-                                                                                           pvalBlocks_index,
-                                                                                           column_blocks, column_block);
-
-                    if edges.empty:
-                        edges = self.__buildEdges(nodes, scoreBlocks_column, pvalBlocks_column, index_block,
-                                                  column_block, filter_type, hard_threshold, sign)
-                    else:
-                        dat_edges = self.__buildEdges(nodes, scoreBlocks_column, pvalBlocks_column, index_block,
-                                                      column_block, filter_type, hard_threshold, sign)
-                        edges = pd.concat([edges, dat_edges], sort=False).reset_index(drop=True)
-                else:
-
-                    if index_block != column_block:
-
-                        nodes, scoreBlocks_column, pvalBlocks_column = self.__scoreBlockColumn(nodes, peaktable,
-                                                                                               scoreBlocks_index,
-                                                                                               pvalBlocks_index,
-                                                                                               column_blocks,
-                                                                                               column_block);
-                        if edges.empty:
-                            edges = self.__buildEdges(nodes, scoreBlocks_column, pvalBlocks_column, index_block,
-                                                      column_block, filter_type, hard_threshold, sign)
-                        else:
-                            dat_edges = self.__buildEdges(nodes, scoreBlocks_column, pvalBlocks_column, index_block,
-                                                          column_block, filter_type, hard_threshold, sign)
-                            edges = pd.concat([edges, dat_edges], sort=False).reset_index(drop=True)
-                    else:
-                        if ((len(index_blocks) == 1) and (len(column_blocks) == 1)):
-                            if ((index_blocks[0] == '#no_multiple_blocks') and (
-                                    column_blocks[0] == '#no_multiple_blocks')):
-                                edges = self.__buildEdges(nodes, scoreBlocks_index, pvalBlocks_index, index_block,
-                                                          column_block, filter_type, hard_threshold, sign)
+                square = False;
 
-        self.__setNodes(nodes)
-        self.__setEdges(edges)
+            # The nodes are added in the order the block pairs are visited, so the edges of every pair can then be built
+            # independently against the same nodes
+            block_pairs = []
 
-    def getNodes(self):
+            for idx, index_block in enumerate(index_blocks):
 
-        return self.__nodes
+                nodes = self.__addBlockNodes(nodes, peaktable, index_blocks, index_block)
 
-    def getEdges(self):
+                for column_block in column_blocks[idx if square else 0:]:
 
-        return self.__edges
+                    if self.__withinBlocks or index_block != column_block or index_block == '#no_multiple_blocks':
+
+                        nodes = self.__addBlockNodes(nodes, peaktable, column_blocks, column_block)
+
+                        block_pairs.append((index_block, column_block))
+
+            index_positions = self.__blockPositions(peaktable, datatable.index, index_blocks)
+            column_positions = self.__blockPositions(peaktable, datatable.columns, column_blocks)
+
+            if pvalues is None and filter_type.lower() == 'pvalue':
+                panel_filter_type = 'score';
+            else:
+                panel_filter_type = filter_type;
+
+            for index_block, column_block in block_pairs:
+                tasks.append((datatable, pvalues, index_block, column_block, index_positions[index_block],
+                              column_positions[column_block], panel_filter_type))
+
+        if 'Block' not in peaktable.columns and 'Block' in nodes.columns:
+            nodes = nodes.drop(columns="Block")
+
+        return nodes, tasks
+
+    def __joinEdges(self, batches):
+        # Joins edge batches in a single concat. Empty batches are left out, as they do not carry the column types.
+
+        non_empty = [dat_edges for dat_edges in batches if not dat_edges.empty]
+
+        if len(non_empty) > 1:
+            return pd.concat(non_empty, sort=False).reset_index(drop=True)
+        elif non_empty:
+            return non_empty[0]
+        elif batches:
+            return batches[-1]
+
+        return pd.DataFrame()
+
+    def __thresholdIndex(self, filter_type, sign):
+        # The candidate edges (every pair with a score or pvalue) are found once for the withinBlocks setting, and sorted
+        # by the filtered value for each filter type and sign, so that the edges passing any threshold are found by
+        # binary search
+
+        if self.__candidates is None or self.__candidates[-1] != self.__withinBlocks:
+            self.__candidates = self.__candidatePositions() + (self.__withinBlocks,)
+            self.__candidateIndex = {}
+
+        _, _, _, _, score, pval, _, _ = self.__candidates
+        index = self.__candidateIndex
+
+        if filter_type.lower() == 'pvalue' and pval is None:
+            filter_type = 'score'
+
+        key = (filter_type.lower(), sign.lower())
+
+        if key not in index:
+            rows = np.arange(len(score))
+
+            if sign.lower() == "pos":
+                rows = rows[score > 0]
+            elif sign.lower() == "neg":
+                rows = rows[score < 0]
+
+            if filter_type.lower() == 'score':
+                # Sorted by descending absolute score, as the negated values
+                values = -np.abs(score[rows].astype(float))
+            else:
+                values = pval[rows].astype(float)
+
+            order = np.argsort(values, kind='stable')
+
+            index[key] = (rows[order], values[order])
+
+        order, values = index[key]
+
+        return order, values, filter_type
+
+    def __candidatePositions(self):
+        # Returns the nodes, blocks, the node positions (as int32) with the scores and pvalues of every pair with a score
+        # or pvalue, and the number of possible edges between the block pairs built. The edge tables are not built,
+        # and a lazyMatrix is read one tile of rows at a time.
+
+        peaktable = self.__peaktable
+        datatable = self.__datatable
+
+        if self.__isPairTable(datatable):
+            nodes, blocks, start_pos, end_pos, score, pval = self.__pairPositions(peaktable, datatable, 'all', None)
+
+            n_nodes = len(nodes)
+            possible = n_nodes * (n_nodes - 1) / 2
+
+            if blocks[0] != '#no_multiple_blocks' and not self.__withinBlocks:
+                # Only the pairs between blocks are possible
+                block_sizes = nodes['Block'].value_counts().values
+                possible = (n_nodes ** 2 - (block_sizes ** 2).sum()) / 2
+
+            return (nodes, blocks, start_pos.astype(np.int32), end_pos.astype(np.int32), score, pval, possible)
+
+        nodes, tasks = self.__blockPairTasks('all')
+
+        blocks = list(nodes['Block'].unique()) if 'Block' in nodes.columns else ['#no_multiple_blocks']
+
+        start_pos, end_pos, score, pval = [], [], [], []
+        possible = 0
+
+        for datatable, pvalues, index_block, column_block, rows, columns, _ in tasks:
+
+            SCORE = self.__blockSlice(datatable, rows, columns)
+            PVAL = self.__blockSlice(pvalues, rows, columns) if pvalues is not None else None
+
+            if blocks[0] != '#no_multiple_blocks':
+                start_block_nodes = nodes[nodes['Block'] == index_block]
+                end_block_nodes = nodes[nodes['Block'] == column_block]
+            else:
+                start_block_nodes = nodes
+                end_block_nodes = nodes
+
+            for tile_start, tile_end, tile_score, tile_pval in self.__maskPositions(start_block_nodes, end_block_nodes,
+                                                                                   SCORE, PVAL, 'all', None):
+                start_pos.append(tile_start.astype(np.int32))
+                end_pos.append(tile_end.astype(np.int32))
+                score.append(tile_score)
+
+                if tile_pval is not None:
+                    pval.append(tile_pval)
+
+            n_rows, n_columns = SCORE.shape
+
+            # Only the upper triangle of a square matrix is used
+            if set(list(SCORE.columns)) == set(list(SCORE.index)):
+                possible += n_rows * (n_rows - 1) / 2
+            else:
+                possible += n_rows * n_columns
+
+        if not tasks:
+            return (nodes, blocks, np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32), np.zeros(0), None, 0)
+
+        return (nodes, blocks, np.concatenate(start_pos), np.concatenate(end_pos), np.concatenate(score),
+                np.concatenate(pval) if pval else None, possible)
+
+    def __passCount(self, values, filter_type, hard_threshold):
+        # The number of sorted candidate edges passing the threshold (|score| > threshold or pvalue < threshold)
+
+        if filter_type.lower() == 'score':
+            return np.searchsorted(values, -hard_threshold, side='left')
+
+        return np.searchsorted(values, hard_threshold, side='left')
 
     def __checkData(self, df):
 
-        if not isinstance(df, pd.DataFrame):
+        if isinstance(df, dict):
+            for panel in df.values():
+                self.__checkData(panel)
+        elif not isinstance(df, (pd.DataFrame, lazyMatrix, sparseMatrix)):
             print("Error: A dataframe was not entered. Please check your data.")
 
         return df
@@ -179,77 +484,129 @@ class Edge:
         return PeakTable
 
     def __checkDataIntersect(self, peaktable, datatable, pvalues):
-        # Checks the datatable and peaktable contain the same number and order of nodes. If not, then the intersect is taken and the order based on the node (peak) list.
+        # Checks the datatable and peaktable contain the same nodes. If not, then the intersect is taken. The rows and
+        # columns are ordered based on the node (peak) list.
 
-        data_node_list = list(list(datatable.columns) + list(set(list(datatable.index)) - set(list(datatable.columns))))
-        peak_node_list = list(peaktable.Name)
+        peak_names = pd.Index(peaktable['Name'])
 
-        columns_set = frozenset(list(datatable.columns))
-        index_set = frozenset(list(datatable.index))
+        in_index = peak_names.isin(datatable.index)
+        in_columns = peak_names.isin(datatable.columns)
 
-        if sorted(peak_node_list) == sorted(data_node_list):
+        if not (in_index | in_columns).any():
+            print("Error: The PeakTable Name list and DataTable row/column list do not have any common values!")
+            sys.exit()
 
-            column_names = [x for x in peak_node_list if x in columns_set]
-            index_names = [x for x in peak_node_list if x in index_set]
+        if not (in_index | in_columns).all():
+            # Peaks without any row or column are removed and the peaks reindexed
+            peaktable = peaktable[in_index | in_columns].drop(columns=['Idx']).reset_index(drop=True)
 
-            tmp_data = datatable[column_names]
-            datatable = tmp_data.reindex(index_names)
+            peaktable.index.name = 'Idx'
 
-            if pvalues is not None:
-                tmp_pvalues = pvalues[column_names]
-                pvalues = tmp_pvalues.reindex(index_names)
-        else:
-            if len(peak_node_list) > len(data_node_list):
+            peaktable = peaktable.reset_index()
 
-                check_intersect = set(peak_node_list).intersection(data_node_list)
+            peak_names = pd.Index(peaktable['Name'])
 
-                if check_intersect:
-                    sliced_peaks = peaktable[peaktable.Name.isin(data_node_list)]
+            in_index = peak_names.isin(datatable.index)
+            in_columns = peak_names.isin(datatable.columns)
 
-                    sliced_peaks_node_list = list(sliced_peaks.Name)
+        index_names = peak_names[in_index]
+        column_names = peak_names[in_columns]
 
-                    column_names = [x for x in sliced_peaks_node_list if x in columns_set]
-                    index_names = [x for x in sliced_peaks_node_list if x in index_set]
+        datatable = self.__alignMatrix(datatable, index_names, column_names)
 
-                    tmp_data = datatable[column_names]
-                    datatable = tmp_data.reindex(index_names)
+        if pvalues is not None:
+            pvalues = self.__alignMatrix(pvalues, index_names, column_names)
 
-                    if pvalues is not None:
-                        tmp_pvalues = pvalues[column_names]
-                        pvalues = tmp_pvalues.reindex(index_names)
+        return peaktable, datatable, pvalues
 
-                    peaktable.drop('Idx', 1, inplace=True)
+    def __isPairTable(self, df):
 
-                    peaktable = peaktable.reset_index(drop=True)
+        return isinstance(df, pd.DataFrame) and {'start_name', 'end_name', 'score'}.issubset(df.columns)
 
-                    peaktable.index.name = 'Idx'
+    def __checkPairIntersect(self, peaktable, datatable, pvalues):
+        # Checks a long table of pairs against the peaktable. All peaks are kept as nodes, as nodes without any pairs
+        # passing a threshold are not listed in the table, and pairs with names not in the peaktable are removed. An
+        # empty table (no pairs passed the threshold) is valid, and gives the nodes without any edges.
 
-                    peaktable = peaktable.reset_index()
-                else:
-                    print("Error: The PeakTable Name list and DataTable row/column list do not have any common values!")
-                    sys.exit()
-            else:
-                check_intersect = set(data_node_list).intersection(peak_node_list)
+        if pvalues is not None:
+            print("Error: The pvalues are taken from the \"pvalue\" column of a table of pairs. Set pvalues to None.")
+            sys.exit()
+
+        peak_node_set = frozenset(list(peaktable.Name))
 
-                if check_intersect:
-                    column_names = [x for x in peak_node_list if x in columns_set]
-                    index_names = [x for x in peak_node_list if x in index_set]
+        in_peaks = datatable['start_name'].isin(peak_node_set) & datatable['end_name'].isin(peak_node_set)
 
-                    tmp_data = datatable[column_names]
-                    tmp_data = tmp_data[tmp_data.index.isin(index_names)]
-                    datatable = tmp_data.reindex(index_names)
+        if len(datatable) > 0 and not in_peaks.any():
+            print("Error: The PeakTable Name list and the start/end names of the pairs do not have any common values!")
+            sys.exit()
 
-                    if pvalues is not None:
-                        tmp_pvalues = pvalues[column_names]
-                        tmp_pvalues = tmp_pvalues[tmp_pvalues.index.isin(index_names)]
-                        pvalues = tmp_pvalues.reindex(index_names)
-                else:
-                    print("Error: The PeakTable Name list and DataTable row/column list do not have any common values!")
-                    sys.exit()
+        return peaktable, datatable[in_peaks].reset_index(drop=True), pvalues
 
-        return peaktable, datatable, pvalues
+    def __checkPanelIntersect(self, peaktable, datatable, pvalues):
+        # Checks a dictionary of rectangular panels between blocks against the peaktable. The peaktable is sliced to the
+        # nodes of all panels if it contains more, and each panel is ordered based on the node (peak) list.
+
+        if "Block" not in peaktable.columns:
+            print("Error: \"Block\" column not in Peak Table. A Block column is required when the datatable is a dictionary of panels.")
+            sys.exit()
+
+        if pvalues is not None:
+            if not isinstance(pvalues, dict) or set(pvalues.keys()) != set(datatable.keys()):
+                print("Error: The pvalues must be a dictionary of panels with the same keys as the datatable.")
+                sys.exit()
+
+        data_node_set = set()
+
+        for panel in datatable.values():
+            data_node_set.update(list(panel.index) + list(panel.columns))
+
+        if not data_node_set.intersection(list(peaktable.Name)):
+            print("Error: The PeakTable Name list and DataTable row/column list do not have any common values!")
+            sys.exit()
+
+        if len(peaktable) > len(data_node_set):
+            peaktable = peaktable[peaktable.Name.isin(data_node_set)].drop(columns=['Idx']).reset_index(drop=True)
+
+            peaktable.index.name = 'Idx'
 
-    def __paramCheck(self, filter_type, hard_threshold, withinBlocks, sign):
+            peaktable = peaktable.reset_index()
+
+        peak_node_list = list(peaktable.Name)
+
+        aligned_data = {}
+        aligned_pvalues = {} if pvalues is not None else None
+
+        for key, panel in datatable.items():
+
+            index_set = frozenset(list(panel.index))
+            columns_set = frozenset(list(panel.columns))
+
+            index_names = [x for x in peak_node_list if x in index_set]
+            column_names = [x for x in peak_node_list if x in columns_set]
+
+            aligned_data[key] = self.__alignMatrix(panel, index_names, column_names)
+
+            if pvalues is not None:
+                aligned_pvalues[key] = self.__alignMatrix(pvalues[key], index_names, column_names)
+
+        return peaktable, aligned_data, aligned_pvalues
+
+    def __alignMatrix(self, matrix, index_names, column_names):
+
+        if isinstance(matrix, lazyMatrix):
+            # Only the row and column order of the handle changes, no values are read
+            return matrix.select(index_names, column_names)
+
+        index_names = pd.Index(index_names)
+        column_names = pd.Index(column_names)
+
+        # A matrix already in the peak order is used as it is, without a copy
+        if matrix.index.equals(index_names) and matrix.columns.equals(column_names):
+            return matrix
+
+        return matrix.iloc[matrix.index.get_indexer(index_names), matrix.columns.get_indexer(column_names)]
+
+    def __paramCheck(self, filter_type, hard_threshold, withinBlocks, sign, compact, n_jobs):
 
         if filter_type.lower() not in ["pvalue", "score"]:
             print("Error: Filter type not valid. Choose either \"Pvalue\" or \"Score\".")
@@ -268,92 +625,94 @@ class Edge:
             print("Error: Sign is not valid. Choose either \"pos\" or \"neg\" or \"both\".")
             sys.exit()
 
-        return filter_type, hard_threshold, withinBlocks, sign
+        if not isinstance(compact, bool):
+            print("Error: Compact not valid. Choose either \"True\" or \"False\".")
+            sys.exit()
 
-    def __scoreBlockIndex(self, nodes, peaks, data, pvalues, blocks, index_block):
+        if not isinstance(n_jobs, int) or isinstance(n_jobs, bool) or (n_jobs < 1 and n_jobs != -1):
+            print("Error: Number of jobs is not valid. Choose a positive integer, or -1 to use all cores.")
+            sys.exit()
 
-        node_data = []
+        if n_jobs == -1:
+            n_jobs = os.cpu_count() or 1
 
-        if blocks[0] != '#no_multiple_blocks':
-            for col in peaks.columns:
-                node_data.append(list(peaks[peaks['Block'] == index_block][col].values))
+        return filter_type, hard_threshold, withinBlocks, sign, compact, n_jobs
 
-            index_block_names = list(peaks[peaks['Block'] == index_block]['Name'].values)
-        else:
-            for col in peaks.columns:
-                node_data.append(list(peaks[col].values))
+    def __cacheCheck(self, cache_dir, cache_size):
+
+        if cache_dir is not None:
+            if not isinstance(cache_dir, str):
+                print("Error: Cache directory is not valid. Choose a directory path, or None.")
+                sys.exit()
 
-            index_block_names = list(peaks['Name'].values)
+            os.makedirs(cache_dir, exist_ok=True)
 
-        if blocks[0] == '#no_multiple_blocks':
-            scoreBlocks_index = data
-        else:
-            scoreBlocks_index = data[data.index.isin(index_block_names)]
+        if not isinstance(cache_size, (float, int)) or isinstance(cache_size, bool) or cache_size <= 0:
+            print("Error: Cache size is not valid. Choose a positive size in MB.")
+            sys.exit()
 
-        if pvalues is not None:
-            if blocks[0] == '#no_multiple_blocks':
-                pvalBlocks_index = pvalues
-            else:
-                pvalBlocks_index = pvalues[pvalues.index.isin(index_block_names)]
-        else:
-            pvalBlocks_index = None;
+        return cache_dir, cache_size
 
-        if nodes.empty:
-            nodes = pd.DataFrame(np.column_stack(node_data), columns=peaks.columns)
-            nodes['Block'] = index_block
-        else:
-            addedBlocks = list(np.unique(nodes['Block'].values))
+    def __chunkCheck(self, chunk_size):
 
-            if index_block not in addedBlocks:
-                dat = pd.DataFrame(np.column_stack(node_data), columns=peaks.columns)
-                dat['Block'] = index_block
+        if chunk_size is not None:
+            if not isinstance(chunk_size, int) or isinstance(chunk_size, bool) or chunk_size < 1:
+                print("Error: Chunk size is not valid. Choose a positive integer, or None.")
+                sys.exit()
 
-                nodes = pd.concat([nodes, dat], sort=False).reset_index(drop=True)
+        return chunk_size
+
+    def __blockPositions(self, peaks, names, blocks):
+        # Maps each block to the positions of its peaks in the row or column names, in a single pass over the names
 
         if blocks[0] == '#no_multiple_blocks':
-            nodes = nodes.drop(columns="Block")
+            return {blocks[0]: None}
 
-        return nodes, scoreBlocks_index, pvalBlocks_index
+        name_blocks = pd.Series(peaks['Block'].values, index=peaks['Name'].values).reindex(list(names)).values
 
-    def __scoreBlockColumn(self, nodes, peaks, data, pvalues, blocks, column_block):
+        return pd.Series(np.arange(len(names))).groupby(name_blocks, sort=False).indices
 
-        node_data = []
+    def __blockSlice(self, data, rows, columns):
 
-        if blocks[0] != '#no_multiple_blocks':
+        if rows is None:
+            return data
 
-            for col in peaks.columns:
-                node_data.append(list(peaks[peaks['Block'] == column_block][col].values))
+        if isinstance(data, lazyMatrix):
+            return data.select(data.index[rows], data.columns[columns])
 
-            column_block_names = list(peaks[peaks['Block'] == column_block]['Name'].values)
-        else:
-            for col in peaks.columns:
-                node_data.append(list(peaks[col].values))
+        return data.iloc[rows, columns].astype(float)
 
-            column_block_names = list(peaks['Name'].values)
+    def __addBlockNodes(self, nodes, peaks, blocks, block):
+        # Appends the peaks of a block to the nodes, if the block has not already been added
 
-        scoreBlocks_column = data[column_block_names].astype(float)
+        if blocks[0] != '#no_multiple_blocks':
+            peaks = peaks[peaks['Block'] == block]
 
-        if pvalues is not None:
-            pvalBlocks_column = pvalues[column_block_names].astype(float)
-        else:
-            pvalBlocks_column = None;
+        node_data = [list(peaks[col].values) for col in peaks.columns]
 
         if nodes.empty:
             nodes = pd.DataFrame(np.column_stack(node_data), columns=peaks.columns)
-            nodes['Block'] = column_block
+            nodes['Block'] = block
         else:
             addedBlocks = list(np.unique(nodes['Block'].values))
 
-            if column_block not in addedBlocks:
+            if block not in addedBlocks:
                 dat = pd.DataFrame(np.column_stack(node_data), columns=peaks.columns)
-                dat['Block'] = column_block
+                dat['Block'] = block
 
                 nodes = pd.concat([nodes, dat], sort=False).reset_index(drop=True)
 
-        return nodes, scoreBlocks_column, pvalBlocks_column
+        return nodes
 
     def __buildEdges(self, nodes, SCORE, PVAL, start_block, end_block, filter_type, hard_threshold, sign):
 
+        return self.__joinEdges(list(self.__buildEdgeBatches(nodes, SCORE, PVAL, start_block, end_block, filter_type,
+                                                             hard_threshold, sign)))
+
+    def __buildEdgeBatches(self, nodes, SCORE, PVAL, start_block, end_block, filter_type, hard_threshold, sign,
+                           chunk_size=None):
+        # Yields the edges of a block pair one tile of rows at a time
+
         if 'Block' in nodes.columns:
             blocks = list(nodes['Block'].unique())
         else:
@@ -366,213 +725,222 @@ class Edge:
             start_block_nodes = nodes
             end_block_nodes = nodes
 
-        def __score(start_block_nodes, end_block_nodes, SCORE, PVAL, start_block, end_block, blocks, hard_threshold):
+        if filter_type.lower() not in ['score', 'pvalue', 'all']:
+            print("Error: wrong score type specified. Valid entries are 'Score' or 'Pvalue'.")
+            sys.exit()
+
+        batches = self.__maskEdgeBatches(nodes, start_block_nodes, end_block_nodes, SCORE, PVAL, blocks,
+                                         filter_type.lower(), hard_threshold, chunk_size)
+
+        for edges in batches:
+
+            if sign.lower() == "pos":
+                edges = edges[edges['sign'] > 0].reset_index(drop=True)
+            elif sign.lower() == "neg":
+                edges = edges[edges['sign'] < 0].reset_index(drop=True)
 
-            score_cols = SCORE.columns
-            score_rows = SCORE.index
+            yield edges
 
-            start_block_indexes = list(start_block_nodes.index)
-            end_block_indexes = list(end_block_nodes.index)
+    def __buildPairEdges(self, peaktable, pairs, filter_type, hard_threshold, sign):
+        # Builds the nodes and edges from a long table of pairs
 
-            start_block_names = list(start_block_nodes['Name'])
-            end_block_names = list(end_block_nodes['Name'])
+        nodes, blocks, start_pos, end_pos, score, pval = self.__pairPositions(peaktable, pairs, filter_type,
+                                                                              hard_threshold)
 
-            start_block_labels = list(start_block_nodes['Label'])
-            end_block_labels = list(end_block_nodes['Label'])
+        edges = self.__positionEdges(nodes, blocks, start_pos, end_pos, score, pval)
 
-            e = []
+        if sign.lower() == "pos":
+            edges = edges[edges['sign'] > 0].reset_index(drop=True)
+        elif sign.lower() == "neg":
+            edges = edges[edges['sign'] < 0].reset_index(drop=True)
 
-            for i_idx in range(0, len(score_rows)):
+        return nodes, edges
 
-                start_name = score_rows[i_idx]
+    def __pairPositions(self, peaktable, pairs, filter_type, hard_threshold):
+        # Returns the nodes, blocks and the node positions, scores and pvalues of the pairs passing the filter. Each
+        # pair is oriented and the pairs ordered as they would be from the upper triangle of the equivalent matrix.
 
-                if set(list(SCORE.columns)) == set(list(SCORE.index)):
-                    col_idx = i_idx
-                else:
-                    col_idx = 0;
-                    columns_set = frozenset(list(SCORE.columns))
-                    index_set = frozenset(list(SCORE.index))
+        nodes = pd.DataFrame()
 
-                    start_block_names = [x for x in start_block_names if x in index_set]
-                    end_block_names = [x for x in end_block_names if x in columns_set]
+        if 'Block' in peaktable.columns:
+            blocks = list(peaktable.Block.unique())
+        else:
+            blocks = ['#no_multiple_blocks']
 
-                    start_block_labels = list(
-                        start_block_nodes[start_block_nodes['Name'].isin(start_block_names)]['Label'])
-                    end_block_labels = list(end_block_nodes[end_block_nodes['Name'].isin(end_block_names)]['Label'])
+        for block in blocks:
+            nodes = self.__addBlockNodes(nodes, peaktable, blocks, block)
 
-                    start_block_indexes = list(
-                        start_block_nodes[start_block_nodes['Name'].isin(start_block_names)].index)
-                    end_block_indexes = list(end_block_nodes[end_block_nodes['Name'].isin(end_block_names)].index)
+        if blocks[0] == '#no_multiple_blocks':
+            nodes = nodes.drop(columns="Block")
 
-                for j_idx in range(col_idx, len(score_cols)):
+        node_positions = pd.Index(nodes['Name'])
 
-                    if (abs(SCORE.values[i_idx, j_idx]) > hard_threshold):
+        start_pos = node_positions.get_indexer(pairs['start_name'])
+        end_pos = node_positions.get_indexer(pairs['end_name'])
 
-                        end_name = score_cols[j_idx]
+        score = pairs['score'].values.astype(float)
+        pval = pairs['pvalue'].values.astype(float) if 'pvalue' in pairs.columns else None
 
-                        start_label = start_block_labels[i_idx]
-                        end_label = end_block_labels[j_idx]
+        # Without pvalues the scores are filtered, as for a matrix without pvalues
+        if filter_type.lower() == 'all':
+            keep = ~np.isnan(score) if pval is None else ~(np.isnan(score) & np.isnan(pval))
+        elif filter_type.lower() == 'score' or pval is None:
+            keep = np.abs(score) > hard_threshold
+        else:
+            keep = pval < hard_threshold
 
-                        start_index = start_block_indexes[i_idx]
-                        end_index = end_block_indexes[j_idx]
+        keep &= start_pos != end_pos
 
-                        if start_index != end_index:
-                            if PVAL is None:
+        if blocks[0] != '#no_multiple_blocks':
+            block_rank = pd.Index(blocks).get_indexer(nodes['Block'])
+        else:
+            block_rank = np.zeros(len(nodes), dtype=int)
 
-                                if blocks[0] != '#no_multiple_blocks':
-                                    b = [start_index, start_name, start_label, start_block, end_index, end_name,
-                                         end_label, end_block, SCORE.values[i_idx, j_idx],
-                                         np.sign(SCORE.values[i_idx, j_idx])];
-                                else:
-                                    b = [start_index, start_name, start_label, end_index, end_name, end_label,
-                                         SCORE.values[i_idx, j_idx], np.sign(SCORE.values[i_idx, j_idx])];
-                            else:
+        if blocks[0] != '#no_multiple_blocks' and not self.__withinBlocks:
+            keep &= block_rank[start_pos] != block_rank[end_pos]
 
-                                if blocks[0] != '#no_multiple_blocks':
-                                    b = [start_index, start_name, start_label, start_block, end_index, end_name,
-                                         end_label, end_block, SCORE.values[i_idx, j_idx],
-                                         np.sign(SCORE.values[i_idx, j_idx]), PVAL.values[i_idx, j_idx]];
-                                else:
-                                    b = [start_index, start_name, start_label, end_index, end_name, end_label,
-                                         SCORE.values[i_idx, j_idx], np.sign(SCORE.values[i_idx, j_idx]),
-                                         PVAL.values[i_idx, j_idx]];
-                            e.append(b)
+        start_pos, end_pos, score = start_pos[keep], end_pos[keep], score[keep]
 
-            if PVAL is None:
+        if pval is not None:
+            pval = pval[keep]
 
-                if blocks[0] != '#no_multiple_blocks':
-                    score = pd.DataFrame(e, columns=['start_index', 'start_name', 'start_label', 'start_block',
-                                                     'end_index', 'end_name', 'end_label', 'end_block', 'score',
-                                                     'sign'])
-                else:
-                    score = pd.DataFrame(e,
-                                         columns=['start_index', 'start_name', 'start_label', 'end_index', 'end_name',
-                                                  'end_label', 'score', 'sign'])
-            else:
+        # Nodes are ordered by block, so the earlier node of each pair is the start node, as in the upper triangle
+        start_pos, end_pos = np.minimum(start_pos, end_pos), np.maximum(start_pos, end_pos)
 
-                if blocks[0] != '#no_multiple_blocks':
-                    score = pd.DataFrame(e, columns=['start_index', 'start_name', 'start_label', 'start_block',
-                                                     'end_index', 'end_name', 'end_label', 'end_block', 'score', 'sign',
-                                                     'pvalue'])
-                else:
-                    score = pd.DataFrame(e,
-                                         columns=['start_index', 'start_name', 'start_label', 'end_index', 'end_name',
-                                                  'end_label', 'score', 'sign', 'pvalue'])
+        order = np.lexsort((end_pos, start_pos, block_rank[end_pos], block_rank[start_pos]))
 
-            return score
+        # Pairs listed more than once are kept once
+        _, first = np.unique(start_pos[order] * len(nodes) + end_pos[order], return_index=True)
+        order = order[np.sort(first)]
 
-        def __pval(start_block_nodes, end_block_nodes, SCORE, PVAL, start_block, end_block, blocks, hard_threshold):
+        return nodes, blocks, start_pos[order], end_pos[order], score[order], pval[order] if pval is not None else None
 
-            score_cols = SCORE.columns
-            score_rows = SCORE.index
+    def __maskEdgeBatches(self, nodes, start_block_nodes, end_block_nodes, SCORE, PVAL, blocks, filter_type,
+                          hard_threshold, chunk_size=None):
+        # Yields the edges of each tile of rows passing the filter
 
-            start_block_indexes = list(start_block_nodes.index)
-            end_block_indexes = list(end_block_nodes.index)
+        for start_pos, end_pos, score, pval in self.__maskPositions(start_block_nodes, end_block_nodes, SCORE, PVAL,
+                                                                    filter_type, hard_threshold, chunk_size):
 
-            start_block_names = list(start_block_nodes['Name'])
-            end_block_names = list(end_block_nodes['Name'])
+            yield self.__positionEdges(nodes, blocks, start_pos, end_pos, score, pval)
 
-            start_block_labels = list(start_block_nodes['Label'])
-            end_block_labels = list(end_block_nodes['Label'])
+    def __maskPositions(self, start_block_nodes, end_block_nodes, SCORE, PVAL, filter_type, hard_threshold,
+                        chunk_size=None):
+        # Selects the cells of the score matrix that pass the filter with a boolean mask, using only the upper triangle
+        # of a square matrix and the whole of a rectangular one, and yields the node positions, scores and pvalues of
+        # the selected cells. A lazyMatrix is masked one tile of rows at a time, as is a dataframe when a chunk size is
+        # given. Cells are ordered by row, then column.
 
-            e = []
+        square = set(list(SCORE.columns)) == set(list(SCORE.index))
 
-            for i_idx in range(0, len(score_rows)):
+        if not square:
+            start_block_nodes = start_block_nodes[start_block_nodes['Name'].isin(SCORE.index)]
+            end_block_nodes = end_block_nodes[end_block_nodes['Name'].isin(SCORE.columns)]
 
-                start_name = score_rows[i_idx]
+        start_indexes = np.asarray(start_block_nodes.index)
+        end_indexes = np.asarray(end_block_nodes.index)
 
-                if set(list(SCORE.columns)) == set(list(SCORE.index)):
-                    col_idx = i_idx
-                else:
-                    col_idx = 0;
-                    columns_set = frozenset(list(SCORE.columns))
-                    index_set = frozenset(list(SCORE.index))
+        score_chunks = self.__rowChunks(SCORE, chunk_size)
+        pval_chunks = self.__rowChunks(PVAL, chunk_size) if PVAL is not None else None
 
-                    start_block_names = [x for x in start_block_names if x in index_set]
-                    end_block_names = [x for x in end_block_names if x in columns_set]
+        for row_start, score_chunk in score_chunks:
 
-                    start_block_labels = list(
-                        start_block_nodes[start_block_nodes['Name'].isin(start_block_names)]['Label'])
-                    end_block_labels = list(end_block_nodes[end_block_nodes['Name'].isin(end_block_names)]['Label'])
+            score = score_chunk.values
+            pval = next(pval_chunks)[1].values if PVAL is not None else None
 
-                    start_block_indexes = list(
-                        start_block_nodes[start_block_nodes['Name'].isin(start_block_names)].index)
-                    end_block_indexes = list(end_block_nodes[end_block_nodes['Name'].isin(end_block_names)].index)
+            if filter_type.lower() == 'all':
+                # Every cell with a score or pvalue, as the candidates for any threshold
+                keep = ~np.isnan(score) if pval is None else ~(np.isnan(score) & np.isnan(pval))
+            elif filter_type.lower() == 'score':
+                keep = np.abs(score) > hard_threshold
+            elif pval is None:
+                keep = np.ones(score.shape, dtype=bool)
+            else:
+                keep = pval < hard_threshold
 
-                for j_idx in range(col_idx, len(score_cols)):
+            if square:
+                keep = np.triu(keep, row_start)
 
-                    end_name = score_cols[j_idx]
+            i_idx, j_idx = np.nonzero(keep)
 
-                    start_label = start_block_labels[i_idx]
-                    end_label = end_block_labels[j_idx]
+            not_self = start_indexes[i_idx + row_start] != end_indexes[j_idx]
+            i_idx = i_idx[not_self]
+            j_idx = j_idx[not_self]
 
-                    start_index = start_block_indexes[i_idx]
-                    end_index = end_block_indexes[j_idx]
+            yield (start_indexes[i_idx + row_start], end_indexes[j_idx], score[i_idx, j_idx],
+                   pval[i_idx, j_idx] if pval is not None else None)
 
-                    if start_index != end_index:
-                        if PVAL is None:
+    def __positionEdges(self, nodes, blocks, start_pos, end_pos, score, pval):
+        # Builds the edge table of the edges between the nodes at the start and end positions, with their names,
+        # labels and blocks taken from the nodes
 
-                            if blocks[0] != '#no_multiple_blocks':
-                                b = [start_index, start_name, start_label, start_block, end_index, end_name, end_label,
-                                     end_block, SCORE.values[i_idx, j_idx], np.sign(SCORE.values[i_idx, j_idx])];
-                            else:
-                                b = [start_index, start_name, start_label, end_index, end_name, end_label,
-                                     SCORE.values[i_idx, j_idx], np.sign(SCORE.values[i_idx, j_idx])];
+        names = np.asarray(nodes['Name'])
+        labels = np.asarray(nodes['Label'])
 
-                            e.append(b)
-                        else:
-                            if (PVAL.values[i_idx, j_idx] < hard_threshold):
+        edge_data = {'start_index': start_pos, 'start_name': names[start_pos], 'start_label': labels[start_pos]}
 
-                                if blocks[0] != '#no_multiple_blocks':
-                                    b = [start_index, start_name, start_label, start_block, end_index, end_name,
-                                         end_label, end_block, SCORE.values[i_idx, j_idx],
-                                         np.sign(SCORE.values[i_idx, j_idx]), PVAL.values[i_idx, j_idx]]
-                                else:
-                                    b = [start_index, start_name, start_label, end_index, end_name, end_label,
-                                         SCORE.values[i_idx, j_idx], np.sign(SCORE.values[i_idx, j_idx]),
-                                         PVAL.values[i_idx, j_idx]];
+        if blocks[0] != '#no_multiple_blocks':
+            edge_data['start_block'] = np.asarray(nodes['Block'])[start_pos]
 
-                                e.append(b)
+        edge_data.update({'end_index': end_pos, 'end_name': names[end_pos], 'end_label': labels[end_pos]})
 
-            if PVAL is None:
+        if blocks[0] != '#no_multiple_blocks':
+            edge_data['end_block'] = np.asarray(nodes['Block'])[end_pos]
 
-                if blocks[0] != '#no_multiple_blocks':
-                    pval = pd.DataFrame(e,
-                                        columns=['start_index', 'start_name', 'start_label', 'start_block', 'end_index',
-                                                 'end_name', 'end_label', 'end_block', 'score', 'sign'])
-                else:
-                    pval = pd.DataFrame(e, columns=['start_index', 'start_name', 'start_label', 'end_index', 'end_name',
-                                                    'end_label', 'score', 'sign'])
-            else:
+        edge_data['score'] = score
+        edge_data['sign'] = np.sign(score)
 
-                if blocks[0] != '#no_multiple_blocks':
-                    pval = pd.DataFrame(e,
-                                        columns=['start_index', 'start_name', 'start_label', 'start_block', 'end_index',
-                                                 'end_name', 'end_label', 'end_block', 'score', 'sign', 'pvalue'])
-                else:
-                    pval = pd.DataFrame(e, columns=['start_index', 'start_name', 'start_label', 'end_index', 'end_name',
-                                                    'end_label', 'score', 'sign', 'pvalue'])
+        if pval is not None:
+            edge_data['pvalue'] = pval
 
-            return pval
+        if self.__compact:
+            return self.__compactEdges(edge_data)
 
-        options = {'score': __score(start_block_nodes, end_block_nodes, SCORE, PVAL, start_block, end_block, blocks,
-                                    hard_threshold),
-                   'pvalue': __pval(start_block_nodes, end_block_nodes, SCORE, PVAL, start_block, end_block, blocks,
-                                    hard_threshold)}
+        return pd.DataFrame(edge_data)
 
-        edges = pd.DataFrame()
+    def __rowChunks(self, data, chunk_size):
+        # Yields (row start, dataframe) tiles of rows. A dataframe is a single tile unless a chunk size is given.
 
-        if filter_type.lower() in options:
-            edges = options[filter_type.lower()];
+        if isinstance(data, lazyMatrix):
+            yield from data.rowChunks(chunk_size)
+        elif chunk_size is None:
+            yield 0, data
         else:
-            print("Error: wrong score type specified. Valid entries are 'Score' or 'Pvalue'.")
+            for start in range(0, len(data), chunk_size):
+                yield start, data.iloc[start:start + chunk_size]
 
-        if sign.lower() == "pos":
-            edges = edges[edges['sign'] > 0].reset_index(drop=True)
-        elif sign.lower() == "neg":
-            edges = edges[edges['sign'] < 0].reset_index(drop=True)
+    def __compactEdges(self, edge_data):
+        # Node indexes as int32, scores and pvalues as float32 and the sign as int8. Names, labels and blocks are
+        # categoricals over the peak table, so each string is held once rather than on every edge. Using the same
+        # categories for every block keeps the columns categorical when the edges of each block are joined.
+
+        peaktable = self.__peaktable
+
+        categories = {'name': pd.unique(peaktable['Name'].astype(str)),
+                      'label': pd.unique(peaktable['Label'].astype(str))}
+
+        if 'Block' in peaktable.columns:
+            categories['block'] = pd.unique(peaktable['Block'])
+
+        n_edges = len(edge_data['score'])
+
+        compact = {}
+
+        for column, values in edge_data.items():
+
+            kind = column.split('_')[-1]
+
+            if kind == 'index':
+                compact[column] = np.asarray(values, dtype=np.int32)
+            elif kind in categories:
+                values = np.asarray(values) if kind == 'block' else np.asarray(values).astype(str)
+                compact[column] = pd.Categorical(np.broadcast_to(values, (n_edges,)), categories=categories[kind])
+            elif column == 'sign':
+                compact[column] = np.nan_to_num(np.asarray(values, dtype=float)).astype(np.int8)
+            else:
+                compact[column] = np.asarray(values, dtype=np.float32)
 
-        return edges
+        return pd.DataFrame(compact)
 
     def __setNodes(self, nodes):
 
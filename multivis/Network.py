@@ -1,5 +1,11 @@
+import os
 import sys
+import numpy as np
+import pandas as pd
 import networkx as nx
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components, minimum_spanning_tree
+from concurrent.futures import ProcessPoolExecutor
 from .Edge import Edge
 
 class Network(Edge):
@@ -8,8 +14,8 @@ class Network(Edge):
         Initial_Parameters
         ----------
         peaktable : Pandas dataframe containing peak data. Must contain 'Name' and 'Label'.
-        datatable : Pandas dataframe matrix containing scores
-        pvalues : Pandas dataframe matrix containing score/similarity pvalues (if available)
+        datatable : Pandas dataframe matrix containing scores (or a lazyMatrix or sparseMatrix handle, or a dictionary of rectangular matrices between blocks from crossCorrAnalysis)
+        pvalues : Pandas dataframe matrix containing score/similarity pvalues (if available), in the same form as the datatable
 
         Methods
         -------
@@ -19,11 +25,30 @@ class Network(Edge):
             link_type: The value type to represent links in the network (default: 'score')
             withinBlocks: Include scores within blocks if building multi-block network (default: False)
             sign: The sign of the score/similarity to filter on ('pos', 'neg' or 'both') (default: 'both')
+            compact: Build a compact edge table, with int32 node indexes, float32 scores/pvalues, an int8 sign and categorical names, labels and blocks (default: False)
+            n_jobs: The number of threads to build the edges of each pair of blocks with. Setting to -1 uses all cores (default: 1)
+            backend: The graph built with the nodes and edges. Either 'networkx', or 'sparse' for a CSR adjacency matrix of link weights, with the NetworkX graph only built when first requested (default: 'networkx')
+            cache_dir: A directory to cache built nodes and edges in, keyed by a fingerprint of the peak table, matrices and parameters, so an unchanged build is loaded from disk. The graph is rebuilt from the cached edges (default: None, no caching)
+            cache_size: The maximum size of the cache directory in MB. The least recently used entries are removed beyond it (default: 1024)
 
         help : Print this help text
 
-        build : Builds nodes, edges and NetworkX graph.
+        build : Builds nodes, edges and the graph.
         getNetworkx : Returns a NetworkX graph.
+        getAdjacency : Returns a scipy.sparse CSR matrix of the link weights between all nodes, in node index order.
+        getDegree : Returns a Pandas series of the degree of every node, indexed by node index.
+        getNeighbours : Returns a Pandas series of the link weights to the neighbours of a node (by node index), indexed by neighbour node index.
+        getConnectedComponents : Returns a Pandas series of the connected component of every node, indexed by node index.
+        sparsify : Keeps a backbone of the built edges, and rebuilds the graph from it. getEdges then returns the backbone edges, until the next build.
+            method: 'disparity' keeps the edges significant for either node under the disparity filter, 'topk' keeps the k strongest edges of each node, and 'mst' keeps a maximum spanning forest plus the k strongest edges of each node. Edge strength is the absolute score (default: 'disparity')
+            alpha: The significance level of the disparity filter (default: 0.05)
+            k: The number of strongest edges kept for each node by 'topk' and 'mst' (default: 3)
+
+        computeMetrics : Computes node metrics of the NetworkX graph and writes them as node attributes (e.g. for the node_size_scale/node_color_scale of springNetwork). Returns a Pandas dataframe of the metrics, indexed by node index.
+            metrics: A list of metrics from 'degree', 'weighted_degree' (the sum of the absolute edge weights of each node), 'betweenness', 'closeness' and 'eigenvector' (default: all)
+            betweenness_k: The number of pivot nodes sampled per connected component to approximate betweenness. None computes it exactly (default: None)
+            n_jobs: The number of processes to compute the metrics with, across connected components and metrics. Setting to -1 uses all cores (default: 1)
+            seed: The random seed for sampling the betweenness pivots (default: None)
         getLinkType : Returns the link type parameter used in building the network.
     """
 
@@ -31,80 +56,351 @@ class Network(Edge):
 
         Edge.__init__(self, peaktable, datatable, pvalues)
 
+        self.__setBackbone(None)
+        self.__setNetworkx(None)
+        self.__setAdjacency(None)
+
         self.set_params()
 
     def help(self):
         print(Network.usage)
 
-    def set_params(self, filter_type='pvalue', hard_threshold=0.005, link_type='score', withinBlocks=False, sign='both'):
+    def set_params(self, filter_type='pvalue', hard_threshold=0.005, link_type='score', withinBlocks=False, sign='both', compact=False, n_jobs=1, backend='networkx', cache_dir=None, cache_size=1024):
 
-        Edge.set_params(self, filter_type, hard_threshold, withinBlocks, sign)
+        Edge.set_params(self, filter_type, hard_threshold, withinBlocks, sign, compact, n_jobs, cache_dir, cache_size)
 
-        link_type = self.__paramCheck(link_type)
+        link_type, backend = self.__paramCheck(link_type, backend)
 
         self.__setLinkType(link_type)
+        self.__backend = backend;
 
     def build(self):
 
+        self.__setBackbone(None)
+
         Edge.build(self)
 
-        self.__networkXEdges()
+        self.__buildGraph()
+
+    def getEdges(self):
+
+        if self.__backbone is not None:
+            return self.__backbone
+
+        return Edge.getEdges(self)
+
+    def sparsify(self, method='disparity', alpha=0.05, k=3):
+
+        method, alpha, k = self.__sparsifyCheck(method, alpha, k)
+
+        edges = Edge.getEdges(self)
+
+        n_nodes = len(self.getNodes())
+
+        start = edges['start_index'].values.astype(np.int64)
+        end = edges['end_index'].values.astype(np.int64)
+        strength = np.abs(edges['score'].values.astype(float))
+
+        if method.lower() == 'disparity':
+            keep = self.__disparityEdges(start, end, strength, n_nodes, alpha)
+        elif method.lower() == 'topk':
+            keep = self.__topEdges(start, end, strength, n_nodes, k)
+        else:
+            keep = self.__spanningEdges(start, end, strength, n_nodes) | self.__topEdges(start, end, strength, n_nodes, k)
+
+        self.__setBackbone(edges[keep].reset_index(drop=True))
+
+        self.__buildGraph()
 
     def getNetworkx(self):
 
+        # With the sparse backend, the NetworkX graph is built on first use
+        if self.__g is None and not self.getNodes().empty:
+            self.__networkXEdges()
+
         return self.__g
 
+    def getAdjacency(self):
+
+        if self.__adjacency is None and not self.getNodes().empty:
+            self.__adjacencyEdges()
+
+        if self.__adjacency is None:
+            print("Error: The network has not been built. Please run build first.")
+            sys.exit()
+
+        return self.__adjacency
+
+    def getDegree(self):
+
+        adjacency = self.getAdjacency()
+
+        return pd.Series(np.diff(adjacency.indptr), index=self.getNodes().index, name='degree')
+
+    def getNeighbours(self, node_index):
+
+        adjacency = self.getAdjacency()
+
+        if node_index not in self.getNodes().index:
+            print("Error: Node index {} is not in the network. Please check your node index.".format(node_index))
+            sys.exit()
+
+        start, end = adjacency.indptr[node_index], adjacency.indptr[node_index + 1]
+
+        return pd.Series(adjacency.data[start:end], index=adjacency.indices[start:end], name='weight')
+
+    def getConnectedComponents(self):
+
+        _, labels = connected_components(self.getAdjacency(), directed=False)
+
+        return pd.Series(labels, index=self.getNodes().index, name='component')
+
+    def computeMetrics(self, metrics=('degree', 'weighted_degree', 'betweenness', 'closeness', 'eigenvector'), betweenness_k=None, n_jobs=1, seed=None):
+
+        metrics, betweenness_k, n_jobs, seed = self.__metricCheck(metrics, betweenness_k, n_jobs, seed)
+
+        g = self.getNetworkx()
+
+        values = {}
+
+        # Degrees are read directly from the graph. The path and spectral metrics are computed within each connected
+        # component, and scaled as they would be over the whole graph.
+        if 'degree' in metrics:
+            values['degree'] = dict(g.degree())
+
+        if 'weighted_degree' in metrics:
+            # The strength of each node, as the sum of its absolute edge weights (as in sparsify), so positive and
+            # negative scores do not cancel
+            strength = dict.fromkeys(g, 0.0)
+
+            for start, end, weight in g.edges(data='weight', default=1):
+                strength[start] += abs(weight)
+                strength[end] += abs(weight)
+
+            values['weighted_degree'] = strength
+
+        component_metrics = [metric for metric in metrics if metric not in ['degree', 'weighted_degree']]
+
+        if component_metrics:
+            bins = self.__componentBins(g, n_jobs)
+
+            tasks = [(graphs, metric) for metric in component_metrics for graphs in bins]
+
+            if n_jobs == 1 or len(tasks) < 2:
+                results = [_componentMetric(graphs, metric, len(g), betweenness_k, seed) for graphs, metric in tasks]
+            else:
+                # A subgraph view would be pickled with the whole graph, so the processes are sent copies of the components
+                copies = [[h.copy() if nx.is_frozen(h) else h for h in graphs] for graphs in bins]
+                tasks = [(graphs, metric) for metric in component_metrics for graphs in copies]
+
+                with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+                    futures = [pool.submit(_componentMetric, graphs, metric, len(g), betweenness_k, seed) for graphs, metric in tasks]
+                    results = [future.result() for future in futures]
+
+            for (_, metric), result in zip(tasks, results):
+                values.setdefault(metric, {}).update(result)
+
+        for metric in metrics:
+            nx.set_node_attributes(g, values[metric], name=metric)
+
+        return pd.DataFrame({metric: pd.Series(values[metric]) for metric in metrics}).reindex(list(g))
+
     def getLinkType(self):
 
         return self.__link_type
 
-    def __paramCheck(self, link_type):
+    def __paramCheck(self, link_type, backend):
 
         if link_type.lower() not in ["pvalue", "score"]:
             print("Error: Link type not valid. Choose either \"Pvalue\" or \"Score\".")
             sys.exit()
 
-        return link_type
+        if backend.lower() not in ["networkx", "sparse"]:
+            print("Error: Backend not valid. Choose either \"networkx\" or \"sparse\".")
+            sys.exit()
+
+        return link_type, backend
+
+    def __sparsifyCheck(self, method, alpha, k):
+
+        if Edge.getEdges(self).empty:
+            print("Error: The network has no edges. Please run build first.")
+            sys.exit()
+
+        if method.lower() not in ["disparity", "topk", "mst"]:
+            print("Error: Sparsify method not valid. Choose either \"disparity\", \"topk\" or \"mst\".")
+            sys.exit()
+
+        if not isinstance(alpha, (float, int)) or isinstance(alpha, bool) or not 0 < alpha < 1:
+            print("Error: Alpha is not valid. Choose a value between 0 and 1.")
+            sys.exit()
+
+        if not isinstance(k, int) or isinstance(k, bool) or k < 0:
+            print("Error: k is not valid. Choose a non-negative integer.")
+            sys.exit()
+
+        return method, alpha, k
+
+    def __disparityEdges(self, start, end, strength, n_nodes, alpha):
+        # The disparity filter (Serrano et al. 2009). An edge is kept if its share of the strength of either node is
+        # significant against a uniform split of that strength over the node's edges: (1 - p)^(degree - 1) < alpha.
+        # Nodes with a single edge do not make it significant.
+
+        degree = np.bincount(start, minlength=n_nodes) + np.bincount(end, minlength=n_nodes)
+        node_strength = np.bincount(start, strength, minlength=n_nodes) + np.bincount(end, strength, minlength=n_nodes)
+
+        keep = np.zeros(len(start), dtype=bool)
+
+        for node in [start, end]:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                share = np.where(node_strength[node] > 0, strength / node_strength[node], 0)
+
+            keep |= (degree[node] > 1) & ((1 - share) ** (degree[node] - 1) < alpha)
+
+        return keep
+
+    def __topEdges(self, start, end, strength, n_nodes, k):
+        # Keeps the edges among the k strongest of either node. Every edge is listed once per node, the list sorted by
+        # node and descending strength, and each edge ranked by its position within its node.
+
+        node = np.concatenate([start, end])
+        edge = np.concatenate([np.arange(len(start)), np.arange(len(start))])
+
+        order = np.lexsort((-np.concatenate([strength, strength]), node))
+
+        first = np.searchsorted(node[order], node[order], side='left')
+        rank = np.arange(len(order)) - first
+
+        keep = np.zeros(len(start), dtype=bool)
+        keep[edge[order][rank < k]] = True
+
+        return keep
+
+    def __spanningEdges(self, start, end, strength, n_nodes):
+        # A maximum spanning forest by strength. The edges are weighted by their strength rank (1 for the strongest),
+        # as the minimum spanning tree of scipy treats weights of 0 as missing edges.
+
+        rank = np.empty(len(start))
+        rank[np.argsort(-strength, kind='stable')] = np.arange(1, len(start) + 1)
+
+        tree = minimum_spanning_tree(sp.csr_matrix((rank, (start, end)), shape=(n_nodes, n_nodes))).tocoo()
+
+        in_tree = np.zeros(len(start) + 1, dtype=bool)
+        in_tree[tree.data.astype(np.int64)] = True
+
+        return in_tree[rank.astype(np.int64)]
+
+    def __metricCheck(self, metrics, betweenness_k, n_jobs, seed):
+
+        if self.getNetworkx() is None:
+            print("Error: The network has not been built. Please run build first.")
+            sys.exit()
+
+        if isinstance(metrics, str):
+            metrics = [metrics]
+
+        for metric in metrics:
+            if metric not in ['degree', 'weighted_degree', 'betweenness', 'closeness', 'eigenvector']:
+                print("Error: Metric {} not valid. Choose from \"degree\", \"weighted_degree\", \"betweenness\", \"closeness\" and \"eigenvector\".".format(metric))
+                sys.exit()
+
+        if betweenness_k is not None:
+            if not isinstance(betweenness_k, int) or isinstance(betweenness_k, bool) or betweenness_k < 1:
+                print("Error: Betweenness k is not valid. Choose a positive integer, or None for exact betweenness.")
+                sys.exit()
+
+        if not isinstance(n_jobs, int) or isinstance(n_jobs, bool) or (n_jobs < 1 and n_jobs != -1):
+            print("Error: Number of jobs is not valid. Choose a positive integer, or -1 to use all cores.")
+            sys.exit()
+
+        if n_jobs == -1:
+            n_jobs = os.cpu_count() or 1
+
+        if seed is not None:
+            if not isinstance(seed, int) or isinstance(seed, bool):
+                print("Error: Seed is not valid. Choose an integer, or None.")
+                sys.exit()
+
+        return list(dict.fromkeys(metrics)), betweenness_k, n_jobs, seed
+
+    def __componentBins(self, g, n_jobs):
+        # The connected components are spread over up to 4 bins per job, largest first into the smallest bin, so the
+        # work of each bin is roughly even and small components are not each sent to a process on their own. Components
+        # are read-only views of the graph, or the graph itself when it is connected.
+
+        components = sorted(nx.connected_components(g), key=len, reverse=True)
+
+        bins = [[] for _ in range(min(len(components), 4 * n_jobs if n_jobs > 1 else 1))]
+        sizes = np.zeros(len(bins))
+
+        for component in components:
+            idx = int(np.argmin(sizes))
+            bins[idx].append(g if len(component) == len(g) else g.subgraph(component))
+            sizes[idx] += len(component) ** 2
+
+        return bins
+
+    def __linkWeights(self, edges):
+
+        if "pvalue" in edges.columns and self.getLinkType().lower() == "pvalue":
+            return edges['pvalue']
+
+        return edges['score']
 
     def __networkXEdges(self):
 
         nodes = self.getNodes()
         edges = self.getEdges()
 
-        if 'Block' in nodes.columns:
-            blocks = list(nodes['Block'].unique())
-        else:
-            blocks = ['#no_multiple_blocks']
-
         g = nx.Graph()
 
-        if "pvalue" in edges.columns:
+        # Only the node indexes and link values are read, so compact edge tables are used as they are
+        weights = self.__linkWeights(edges)
 
-            if blocks[0] != '#no_multiple_blocks':
+        g.add_weighted_edges_from(zip(edges['start_index'].tolist(), edges['end_index'].tolist(), weights.tolist()))
 
-                for source_index, _, source, source_block, target_index, _, target, target_block, score, _, pvalue in edges.values:
-                    if self.getLinkType().lower() == "pvalue":
-                        g.add_edge(source_index, target_index, weight=pvalue)
-                    elif self.getLinkType().lower() == "score":
-                        g.add_edge(source_index, target_index, weight=score)
-            else:
-                for source_index, _, source, target_index, _, target, score, _, pvalue in edges.values:
-                    if self.getLinkType().lower() == "pvalue":
-                        g.add_edge(source_index, target_index, weight=pvalue)
-                    elif self.getLinkType().lower() == "score":
-                        g.add_edge(source_index, target_index, weight=score)
+        # Attributes are attached to the nodes in the graph only, in one pass over their rows
+        linked_nodes = nodes[nodes.index.isin(list(g))]
+
+        g.add_nodes_from(zip(linked_nodes.index.tolist(), linked_nodes.to_dict('records')))
+
+        self.__setNetworkx(g)
+
+    def __adjacencyEdges(self):
+        # A symmetric CSR matrix over all nodes, holding each link weight in both directions. Zero weights (e.g. a
+        # pvalue of 0) are kept as stored entries, so the stored entries are the links.
+
+        n_nodes = len(self.getNodes())
+        edges = self.getEdges()
+
+        start = edges['start_index'].values.astype(np.int64)
+        end = edges['end_index'].values.astype(np.int64)
+        weights = self.__linkWeights(edges).values.astype(float)
+
+        adjacency = sp.csr_matrix((np.concatenate([weights, weights]), (np.concatenate([start, end]), np.concatenate([end, start]))),
+                                  shape=(n_nodes, n_nodes))
+
+        adjacency.sort_indices()
+
+        self.__setAdjacency(adjacency)
+
+    def __buildGraph(self):
+
+        self.__setNetworkx(None)
+        self.__setAdjacency(None)
+
+        if self.__backend.lower() == 'networkx':
+            self.__networkXEdges()
         else:
+            self.__adjacencyEdges()
 
-            if blocks[0] != '#no_multiple_blocks':
-                for source_index, _, source, source_block, target_index, _, target, target_block, score, _ in edges.values:
-                    g.add_edge(source_index, target_index, weight=score)
-            else:
-                for source_index, _, source, target_index, _, target, score, _ in edges.values:
-                    g.add_edge(source_index, target_index, weight=score)
+    def __setBackbone(self, edges):
 
-        nx.set_node_attributes(g, nodes.to_dict('index'))
+        self.__backbone = edges
 
-        self.__setNetworkx(g)
+    def __setAdjacency(self, adjacency):
+
+        self.__adjacency = adjacency
 
     def __setNetworkx(self, g):
 
@@ -112,4 +408,37 @@ class Network(Edge):
 
     def __setLinkType(self, link_type):
 
-        self.__link_type = link_type
\ No newline at end of file
+        self.__link_type = link_type
+
+
+def _componentMetric(graphs, metric, n_nodes, betweenness_k, seed):
+    # Computes a metric within each connected component, scaled as over the whole graph of n_nodes nodes
+
+    values = {}
+
+    for g in graphs:
+
+        n = len(g)
+
+        if metric == 'betweenness':
+            k = betweenness_k if betweenness_k is not None and betweenness_k < n else None
+
+            # Unnormalised betweenness of an undirected component (already scaled by n / k when sampled), normalised as
+            # for the whole graph
+            component_values = nx.betweenness_centrality(g, k=k, normalized=False, seed=seed)
+            scale = 2 / ((n_nodes - 1) * (n_nodes - 2)) if n_nodes > 2 else 1
+        elif metric == 'closeness':
+            # As with the Wasserman and Faust scaling of networkx, by the fraction of the graph reachable
+            component_values = nx.closeness_centrality(g, wf_improved=False)
+            scale = (n - 1) / (n_nodes - 1) if n_nodes > 1 else 1
+        else:
+            # Eigenvector centrality of a disconnected graph is only defined within each connected component
+            if n > 2:
+                component_values = nx.eigenvector_centrality_numpy(g)
+            else:
+                component_values = {node: 1 / n ** 0.5 for node in g}
+            scale = 1
+
+        values.update({node: float(value) * scale for node, value in component_values.items()})
+
+    return values
@@ -245,6 +245,15 @@ class edgeBundle:
             print("Error: Edges dataframe does not contain \"Score\".")
             sys.exit()
 
+        # Compact edge tables from Edge are joined back to plain columns for the JSON data
+        for column in edges.columns:
+            if isinstance(edges[column].dtype, pd.CategoricalDtype):
+                edges[column] = edges[column].astype(object)
+            elif column in ['start_index', 'end_index']:
+                edges[column] = edges[column].astype(int)
+            elif column in ['score', 'sign', 'pvalue']:
+                edges[column] = edges[column].astype(float)
+
         if 'pvalue' not in edges.columns:
             self.__pvalue_matrix_flag = False;
         else:
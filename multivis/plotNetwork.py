@@ -4,8 +4,8 @@ import numpy as np
 import pandas as pd
 import matplotlib
 import matplotlib.pyplot as plt
-import copy
 from .utils import *
+from .utils.forceLayout import _fastSpring
 
 class plotNetwork:
     usage = """Produces a static spring-embedded network from a NetworkX graph.
@@ -20,7 +20,7 @@ class plotNetwork:
             imageFileName: The image file name to save to (default: 'networkPlot.jpg')
             edgeLabels: Setting to 'True' labels all edges with the similarity score (default: True)
             saveImage: Setting to 'True' will save the image to file (default: True)
-            layout: Set the NetworkX layout type ('circular', 'kamada_kawai', 'random', 'spring', 'spectral') (default: 'spring')
+            layout: Set the NetworkX layout type ('circular', 'kamada_kawai', 'random', 'spring', 'spectral'), or 'fast_spring' for a multilevel Barnes-Hut spring layout suited to large networks (default: 'spring')
             transparent: Setting to 'True' will make the background transparent (default: False)
             dpi: The number of Dots Per Inch (DPI) for the image (default: 200)
             figSize: The figure size as a tuple (width,height) (default: (30,20))
@@ -46,7 +46,8 @@ class plotNetwork:
 
     def __init__(self, g):
 
-        self.__g = self.__checkData(copy.deepcopy(g))
+        # The graph is not copied, as it is only filtered through views of it in build
+        self.__g = self.__checkData(g)
 
         self.set_params()
 
@@ -81,65 +82,10 @@ class plotNetwork:
 
     def build(self):
 
-        g = self.__g
+        g = self.__filteredGraph()
 
         plt.subplots(figsize=self.__figSize);
 
-        edgeList = []
-        for idx, (source, target) in enumerate(g.edges()):
-
-            weight = g.edges[source, target]['weight']
-
-            if self.__sign == "pos":
-                if weight < 0:
-                    edgeList.append((source, target))
-            elif self.__sign == "neg":
-                if weight >= 0:
-                    edgeList.append((source, target))
-
-        g.remove_edges_from(edgeList)
-
-        if self.__filter_column != 'none':
-            nodeList = []
-            for idx, node in enumerate(g.nodes()):
-
-                value = float(g.nodes[node][self.__filter_column])
-                if np.isnan(value):
-                    value = 0;
-
-                if self.__operator == ">":
-                    if value > float(self.__filter_threshold):
-                        nodeList.append(node)
-                elif self.__operator == "<":
-                    if value < float(self.__filter_threshold):
-                        nodeList.append(node)
-                elif self.__operator == "<=":
-                    if value <= float(self.__filter_threshold):
-                        nodeList.append(node)
-                elif self.__operator == ">=":
-                    if value >= float(self.__filter_threshold):
-                        nodeList.append(node)
-
-            for node in nodeList:
-                g.remove_node(node)
-
-        if not self.__keepSingletons:
-            edges = list(g.edges())
-            edgeList = []
-            for edge in edges:
-                source = edge[0]
-                target = edge[1]
-
-                edgeList.append(source)
-                edgeList.append(target)
-
-            edgeNodes = np.unique(edgeList)
-
-            singleNodes = list(set(edgeNodes).symmetric_difference(set(list(g.nodes()))))
-
-            for node in singleNodes:
-                g.remove_node(node)
-
         if not g.nodes():
             print("Error: All nodes have been removed. Please change the filter parameters.")
             sys.exit()
@@ -165,6 +111,8 @@ class plotNetwork:
             pos = nx.spring_layout(g)
         elif self.__layout == "spectral":
             pos = nx.spectral_layout(g)
+        elif self.__layout == "fast_spring":
+            pos = _fastSpring(g)
 
         nodeCmap = plt.cm.get_cmap(self.__node_cmap)   # Sets the color palette for the nodes
 
@@ -218,6 +166,53 @@ class plotNetwork:
 
         plt.show()
 
+    def __filteredGraph(self):
+        # The sign, column and singleton filters are boolean masks over the edge weights and node values, and are
+        # applied through a subgraph view, so the graph is neither copied nor changed and can be filtered again
+
+        g = self.__g
+
+        nodes = pd.Index(list(g.nodes()))
+        edges = list(g.edges())
+
+        weights = np.array([weight for _, _, weight in g.edges(data='weight')], dtype=float)
+
+        if self.__sign == "pos":
+            keep_edges = weights >= 0
+        elif self.__sign == "neg":
+            keep_edges = weights < 0
+        else:
+            keep_edges = np.ones(len(edges), dtype=bool)
+
+        keep_nodes = np.ones(len(nodes), dtype=bool)
+
+        if self.__filter_column != 'none':
+            values = np.array([value for _, value in g.nodes(data=self.__filter_column)], dtype=float)
+            values = np.nan_to_num(values, nan=0)
+
+            # Nodes with values passing the comparison are removed
+            operators = {">": np.greater, "<": np.less, "<=": np.less_equal, ">=": np.greater_equal}
+
+            keep_nodes &= ~operators[self.__operator](values, float(self.__filter_threshold))
+
+        if not self.__keepSingletons:
+            source = nodes.get_indexer([edge[0] for edge in edges])
+            target = nodes.get_indexer([edge[1] for edge in edges])
+
+            linking = keep_edges & keep_nodes[source] & keep_nodes[target]
+
+            linked = np.zeros(len(nodes), dtype=bool)
+            linked[source[linking]] = True
+            linked[target[linking]] = True
+
+            keep_nodes &= linked
+
+        # The kept nodes are tested by membership, so the view lists them in the order of the graph
+        kept_nodes = set(nodes[keep_nodes])
+        kept_edges = [edge for edge, keep in zip(edges, keep_edges) if keep]
+
+        return nx.subgraph_view(g, filter_node=kept_nodes.__contains__, filter_edge=nx.filters.show_edges(kept_edges))
+
     def __checkData(self, g):
 
         if not isinstance(g, nx.classes.graph.Graph):
@@ -247,8 +242,8 @@ class plotNetwork:
             print("Error: Save image is not valid. Choose either \"True\" or \"False\".")
             sys.exit()
 
-        if layout not in ["circular", "kamada_kawai", "random", "spring", "spectral"]:
-            print("Error: Layout program not valid. Choose either \"circular\", \"kamada_kawai\", \"random\", \"spring\", \"spectral\".")
+        if layout not in ["circular", "kamada_kawai", "random", "spring", "spectral", "fast_spring"]:
+            print("Error: Layout program not valid. Choose either \"circular\", \"kamada_kawai\", \"random\", \"spring\", \"spectral\", \"fast_spring\".")
             sys.exit()
 
         if not isinstance(transparent, bool):
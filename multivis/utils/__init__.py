@@ -2,10 +2,14 @@ from .transform import transform
 from .scaler import scaler
 from .cluster import cluster
 from .corrAnalysis import corrAnalysis
+from .crossCorrAnalysis import crossCorrAnalysis
+from .corrAccumulator import corrAccumulator
+from .lazyMatrix import lazyMatrix
+from .sparseMatrix import sparseMatrix
 from .groups2blocks import groups2blocks
 from .mergeBlocks import mergeBlocks
 from .loadData import loadData
 from .statistics import statistics
 from .imputeData import imputeData
 
-__all__ = ["transform", "scaler", "corrAnalysis", "cluster", "groups2blocks", "mergeBlocks", "loadData", "statistics", "imputeData"]
+__all__ = ["transform", "scaler", "corrAnalysis", "crossCorrAnalysis", "corrAccumulator", "lazyMatrix", "sparseMatrix", "cluster", "groups2blocks", "mergeBlocks", "loadData", "statistics", "imputeData"]
@@ -3,6 +3,7 @@ import numpy as np
 import pandas as pd
 import scipy.spatial as sp, scipy.cluster.hierarchy as hc
 from scipy.spatial.distance import squareform
+from .lazyMatrix import lazyMatrix
 
 def cluster(matrix, transpose_non_similarity, is_similarity, distance_metric, linkage_method):
     """Performs linkage clustering given a matrix of values. If the matrix does not contain correlation coefficients, then the spatial distance
@@ -10,7 +11,7 @@ def cluster(matrix, transpose_non_similarity, is_similarity, distance_metric, li
 
         Parameters
         ----------
-        matrix : A Pandas dataframe matrix of scores
+        matrix : A Pandas dataframe matrix of scores, or a lazyMatrix handle (similarity matrices are then read tile by tile)
         transpose_non_similarity : Setting to 'True' will transpose the matrix if it is not a similarity matrix
         is_similarity : Setting to 'True' will treat the matrix as if it contains similarity values/correlation coefficients
         distance_metric : Set the distance metric. Used if the matrix does not contain correlation coefficients.
@@ -25,6 +26,15 @@ def cluster(matrix, transpose_non_similarity, is_similarity, distance_metric, li
 
     matrix, transpose_non_similarity, is_similarity, distance_metric, linkage_method = __checkData(matrix, transpose_non_similarity, is_similarity, distance_metric, linkage_method)
 
+    if isinstance(matrix, lazyMatrix):
+
+        if is_similarity:
+            linkage = hc.linkage(__lazyDissimilarity(matrix), linkage_method)
+
+            return matrix, linkage, linkage
+
+        matrix = matrix.toDataFrame()
+
     #Replace any Nan values with 0
     matrix = matrix.fillna(0)
 
@@ -49,6 +59,31 @@ def cluster(matrix, transpose_non_similarity, is_similarity, distance_metric, li
 
     return matrix, row_linkage, col_linkage
 
+def __lazyDissimilarity(matrix):
+    # Builds the condensed dissimilarity vector of a similarity matrix on disk one tile of rows at a time, in place of
+    # the dense symmetrised copies. Matrices written by corrAnalysis are already symmetric, so only the entries above
+    # the diagonal of each row are read. Missing values count as zero similarity.
+
+    n = matrix.shape[0]
+
+    if list(matrix.index) != list(matrix.columns):
+        print("Error: A similarity matrix must have the same row and column order. Please check your data.")
+        sys.exit()
+
+    condensed = np.empty(n * (n - 1) // 2)
+
+    for start, chunk in matrix.rowChunks():
+
+        Z = np.nan_to_num(chunk.values)
+
+        for offset in range(Z.shape[0]):
+            i = start + offset
+            position = i * n - i * (i + 1) // 2
+
+            condensed[position:position + n - i - 1] = 1 - np.abs(Z[offset, i + 1:])
+
+    return condensed
+
 def __checkData(matrix, transpose_non_similarity, is_similarity, distance_metric, linkage_method):
 
     VALID_METRICS = ['euclidean', 'l2', 'l1', 'manhattan', 'cityblock', 'braycurtis', 'canberra', 'chebyshev', 'correlation',
@@ -59,7 +94,7 @@ def __checkData(matrix, transpose_non_similarity, is_similarity, distance_metric
 
     EUCLIDEAN_LINKAGE_METHODS = ['centroid', 'median', 'ward']
 
-    if not isinstance(matrix, pd.DataFrame):
+    if not isinstance(matrix, (pd.DataFrame, lazyMatrix)):
         print("Error: A dataframe was not entered. Please check your data.")
         sys.exit()
 
@@ -0,0 +1,96 @@
+import sys
+import numpy as np
+import pandas as pd
+from .corrAnalysis import _momentsToCorr, _corrPvalue
+
+class corrAccumulator:
+    usage = """Accumulates Pearson correlations over batches of samples. The pairwise counts, sums and cross-products of
+        the variables are kept (over the samples observed for each pair), so each new batch is added without the
+        previous samples, and the correlations match corrAnalysis over all samples absorbed so far.
+
+        Initial_Parameters
+        ----------
+        df_data : A Pandas dataframe matrix of values for the first batch of samples. Its columns fix the variables.
+
+        Methods
+        -------
+        help : Print this help text
+
+        update : Adds a batch of samples (a Pandas dataframe matrix of values with the same columns).
+        getCorrelation : Returns Pandas dataframe matrices of the correlation coefficients and pvalues over all samples added.
+        getNumberOfSamples : Returns the number of samples added.
+    """
+
+    def __init__(self, df_data):
+
+        df_data = self.__checkData(df_data)
+
+        n_features = df_data.shape[1]
+
+        self.__columns = df_data.columns
+
+        # Values are shifted by the first batch means before summing, which keeps the cross-products small
+        with np.errstate(invalid='ignore'):
+            shift = np.nanmean(df_data.values, axis=0) if len(df_data) > 0 else np.zeros(n_features)
+
+        self.__shift = np.nan_to_num(shift)
+
+        self.__n = np.zeros((n_features, n_features))
+        self.__sx = np.zeros((n_features, n_features))
+        self.__sxx = np.zeros((n_features, n_features))
+        self.__sxy = np.zeros((n_features, n_features))
+        self.__samples = 0
+
+        self.update(df_data)
+
+    def help(self):
+        print(corrAccumulator.usage)
+
+    def update(self, df_data):
+
+        df_data = self.__checkBatch(self.__checkData(df_data))
+
+        X = df_data.values - self.__shift
+
+        M = (~np.isnan(X)).astype(float)
+        X = np.where(M > 0, X, 0.0)
+
+        # For each pair (i, j) the sums are over the samples where both are observed. The sums of column j over the
+        # pairs are the transpose of those of column i, so only one of each is kept.
+        self.__n += M.T @ M
+        self.__sx += X.T @ M
+        self.__sxx += (X ** 2).T @ M
+        self.__sxy += X.T @ X
+        self.__samples += len(df_data)
+
+    def getCorrelation(self):
+
+        corr = _momentsToCorr(self.__n, self.__sx, self.__sx.T, self.__sxx, self.__sxx.T, self.__sxy)
+        pval = _corrPvalue(corr, self.__n)
+
+        df_corr = pd.DataFrame(corr, index=self.__columns, columns=self.__columns)
+        df_pval = pd.DataFrame(pval, index=self.__columns, columns=self.__columns)
+
+        return df_corr, df_pval
+
+    def getNumberOfSamples(self):
+
+        return self.__samples
+
+    def __checkData(self, df):
+
+        if not isinstance(df, pd.DataFrame):
+            print("Error: A dataframe was not entered. Please check your data.")
+            sys.exit()
+
+        return df.astype(float)
+
+    def __checkBatch(self, df):
+
+        missing = [x for x in self.__columns if x not in frozenset(df.columns)]
+
+        if missing:
+            print("Error: The batch does not contain the columns {}. Please check your data.".format(', '.join(map(str, missing))))
+            sys.exit()
+
+        return df[self.__columns]
@@ -1,65 +1,623 @@
+import os
 import sys
-from scipy import stats
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from multiprocessing import shared_memory
+from scipy import stats, special
 from tqdm import tqdm
 import numpy as np
 import pandas as pd
+from .lazyMatrix import lazyMatrix
 
-def corrAnalysis(df_data, correlationType):
+def corrAnalysis(df_data, correlationType, n_jobs=1, memmap_dir=None, threshold=None, filter_type='pvalue', permutations=None, seed=None, early_stop=None):
     """Performs correlation analysis on a given matrix of values.
 
         Parameters
         ----------
         df_data : A Pandas dataframe matrix of values
         correlationType : The correlation type to apply. Either 'Pearson', 'Spearman' or 'KendallTau'
+        n_jobs : The number of processes to compute the correlation matrix with, in tiles. Setting to -1 uses all cores (default: 1)
+        memmap_dir : Directory to write the matrices to block by block as 'corr.npy' and 'pval.npy' memory maps, for matrices too large to hold in memory (default: None keeps them in memory)
+        threshold : If set, only the pairs passing the threshold are kept and returned as a single long dataframe instead of the matrices (default: None)
+        filter_type : The value type the threshold is applied to. Either 'Pvalue' (pvalue < threshold) or 'Score' (absolute coefficient > threshold) (default: 'pvalue')
+        permutations : If set, the pvalues are estimated from this number of permutations of the sample order instead of the parametric test (default: None)
+        seed : Seed number used by the random number generator for the permutations (default: None)
+        early_stop : Stop permuting a pair once this many permutations have reached its absolute coefficient, for clearly non-significant pairs (default: None runs all permutations)
 
         Returns
         -------
-        df_corr : Pandas dataframe matrix of all correlation coefficients
-        df_pval : Pandas dataframe matrix of all correlation pvalues
+        df_corr : Pandas dataframe matrix of all correlation coefficients (a lazyMatrix handle if memmap_dir is set)
+        df_pval : Pandas dataframe matrix of all correlation pvalues (a lazyMatrix handle if memmap_dir is set)
+
+        If threshold is set, a single Pandas dataframe of the pairs passing it is returned instead, with one row per pair
+        and the columns 'start_name', 'end_name', 'score' and 'pvalue'. This can be passed directly to Edge or Network.
     """
 
-    df_data, correlationType = __checkData(df_data.astype(float), correlationType)
+    df_data, correlationType, n_jobs, memmap_dir, threshold, filter_type, permutations, early_stop = __checkData(df_data.astype(float), correlationType, n_jobs, memmap_dir, threshold, filter_type, permutations, early_stop)
 
-    df_corr = pd.DataFrame()
-    df_pval = pd.DataFrame()
+    method = correlationType.lower()
+    data = _prepareData(df_data.values, method)
 
-    for i in tqdm(df_data.columns):
+    n_features = df_data.shape[1]
 
-        corrList = []
-        pvalList = []
+    if threshold is not None:
+        return __thresholdPairs(data, method, df_data.columns, n_jobs, threshold, filter_type)
 
-        for a in df_data.columns:
+    if memmap_dir is None:
+        corr = np.empty((n_features, n_features))
+        pval = np.empty((n_features, n_features))
+    else:
+        corr = np.lib.format.open_memmap(os.path.join(memmap_dir, 'corr.npy'), mode='w+', shape=(n_features, n_features))
+        pval = np.lib.format.open_memmap(os.path.join(memmap_dir, 'pval.npy'), mode='w+', shape=(n_features, n_features))
 
-            mask = ~np.isnan(df_data[i].values) & ~np.isnan(df_data[a].values)
-            x = df_data[i].values[mask]
-            y = df_data[a].values[mask]
+    tiles = _tiles(n_features, n_features, upper=True, size=_tileSize(n_features, n_jobs))
 
-            if correlationType.lower() == "pearson":
-                corr, pval = stats.pearsonr(x, y)
-            elif correlationType.lower() == "spearman":
-                corr, pval = stats.spearmanr(x, y)
-            elif correlationType.lower() == "kendalltau":
-                corr, pval = stats.kendalltau(x, y)
+    # Only the tiles on and above the diagonal are computed, and each is mirrored into the lower triangle
+    for rows, cols, tile_corr, tile_pval in _computeTiles(data, method, tiles, n_jobs):
 
-            corrList.append(corr)
-            pvalList.append(pval)
+        corr[rows, cols] = tile_corr
+        corr[cols, rows] = tile_corr.T
+        pval[rows, cols] = tile_pval
+        pval[cols, rows] = tile_pval.T
 
-        if df_corr.empty:
-            df_corr = pd.DataFrame(np.column_stack(corrList), columns=df_data.columns)
-            df_pval = pd.DataFrame(np.column_stack(pvalList), columns=df_data.columns)
-        else:
-            dat_corr = pd.DataFrame(np.column_stack(corrList), columns=df_data.columns)
-            df_corr = pd.concat([df_corr, dat_corr]);
+    if permutations is not None:
+        pval = __permutationPvalues(data, method, corr, pval, permutations, seed, early_stop, n_jobs)
+
+    if memmap_dir is not None:
+        corr.flush()
+        pval.flush()
 
-            dat_pval = pd.DataFrame(np.column_stack(pvalList), columns=df_data.columns)
-            df_pval = pd.concat([df_pval, dat_pval]);
+        del corr, pval
 
-    df_corr.index = df_data.columns
-    df_pval.index = df_data.columns
+        df_corr = lazyMatrix(os.path.join(memmap_dir, 'corr.npy'), df_data.columns, df_data.columns)
+        df_pval = lazyMatrix(os.path.join(memmap_dir, 'pval.npy'), df_data.columns, df_data.columns)
+
+        return df_corr, df_pval
+
+    df_corr = pd.DataFrame(corr, index=df_data.columns, columns=df_data.columns)
+    df_pval = pd.DataFrame(pval, index=df_data.columns, columns=df_data.columns)
 
     return df_corr, df_pval
 
-def __checkData(df_data, correlationType):
+def __permutationPvalues(data, method, corr, pval, permutations, seed, early_stop, n_jobs):
+    # Two-sided permutation pvalues for every pair above the diagonal. Each batch of permutations is stacked beside
+    # the prepared data, so the correlations of every column with every permuted column come from the same tile
+    # kernels as the observed correlations. A pair stops being permuted once early_stop permutations have reached its absolute
+    # coefficient, and is then given the sequential estimate of Besag and Clifford (exceedances / permutations run).
+
+    n_samples, n_features = next(iter(data.values())).shape
+
+    rng = np.random.default_rng(seed)
+
+    target = np.abs(corr) - 1e-12
+    active = np.triu(~np.isnan(corr), 1)
+
+    exceed = np.zeros((n_features, n_features), dtype=np.int64)
+    runs = np.zeros((n_features, n_features), dtype=np.int64)
+
+    # Permutations are stacked in batches of up to 2^24 values of the prepared data. With early stopping the batches
+    # are kept small, as pairs can only stop between batches.
+    batch = max(1, min(permutations, 2 ** 24 // max(n_samples * n_features, 1)))
+
+    if early_stop is not None:
+        batch = min(batch, max(early_stop, 32))
+
+    progress = tqdm(total=permutations)
+    done = 0
+
+    while done < permutations and active.any():
+
+        size = min(batch, permutations - done)
+        orders = [rng.permutation(n_samples) for _ in range(size)]
+
+        # Only the columns with pairs still being permuted are stacked, and only tiles holding such pairs computed
+        row_idx = np.nonzero(active.any(axis=1))[0]
+        col_idx = np.nonzero(active.any(axis=0))[0]
+
+        n_rows = len(row_idx)
+        n_cols = len(col_idx)
+
+        stacked = {key: np.hstack([array[:, row_idx]] + [array[order][:, col_idx] for order in orders])
+                   for key, array in data.items()}
+
+        # The counts of the batch are kept for the stacked columns and added to those of all pairs at the end
+        pairs = np.ix_(row_idx, col_idx)
+
+        batch_active = active[pairs]
+        batch_target = target[pairs]
+        batch_exceed = np.zeros((n_rows, n_cols), dtype=np.int64)
+
+        tiles = []
+
+        for rows, cols in _tiles(n_rows, n_cols, size=_tileSize(max(n_rows, n_cols), n_jobs)):
+            if batch_active[rows, cols].any():
+                for k in range(size):
+                    offset = n_rows + k * n_cols
+                    tiles.append((rows, slice(cols.start + offset, cols.stop + offset)))
+
+        for rows, cols, tile_corr, _ in _computeTiles(stacked, method, tiles, n_jobs, progress=False, pvalues=False):
+
+            offset = n_rows + ((cols.start - n_rows) // n_cols) * n_cols
+            cols = slice(cols.start - offset, cols.stop - offset)
+
+            with np.errstate(invalid='ignore'):
+                batch_exceed[rows, cols] += (np.abs(tile_corr) >= batch_target[rows, cols]) & batch_active[rows, cols]
+
+        exceed[pairs] += batch_exceed
+        runs[pairs] += batch_active * size
+
+        done += size
+        progress.update(size)
+
+        if early_stop is not None:
+            active &= exceed < early_stop
+
+    progress.close()
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        perm_pval = (exceed + 1) / (runs + 1)
+
+        if early_stop is not None:
+            stopped = exceed >= early_stop
+            perm_pval[stopped] = exceed[stopped] / runs[stopped]
+
+    perm_pval = np.triu(perm_pval, 1)
+    perm_pval = perm_pval + perm_pval.T
+
+    # The diagonal keeps the parametric pvalue of each column with itself
+    np.fill_diagonal(perm_pval, np.diag(pval))
+    perm_pval[np.isnan(corr)] = np.nan
+
+    return perm_pval
+
+def __thresholdPairs(data, method, names, n_jobs, threshold, filter_type):
+    # Keeps only the pairs above the diagonal of each tile that pass the threshold, so memory scales with the number of
+    # pairs kept rather than the size of the matrix.
+
+    n_features = len(names)
+
+    start_idx = []
+    end_idx = []
+    scores = []
+    pvalues = []
+
+    tiles = _tiles(n_features, n_features, upper=True, size=_tileSize(n_features, n_jobs))
+
+    for rows, cols, tile_corr, tile_pval in _computeTiles(data, method, tiles, n_jobs):
+
+        if filter_type.lower() == 'score':
+            keep = np.abs(tile_corr) > threshold
+        else:
+            keep = tile_pval < threshold
+
+        i_idx, j_idx = np.nonzero(keep)
+
+        i_idx = i_idx + rows.start
+        j_idx = j_idx + cols.start
+
+        upper = j_idx > i_idx
+
+        start_idx.append(i_idx[upper])
+        end_idx.append(j_idx[upper])
+        scores.append(tile_corr[keep][upper])
+        pvalues.append(tile_pval[keep][upper])
+
+    start_idx = np.concatenate(start_idx) if start_idx else np.empty(0, dtype=int)
+    end_idx = np.concatenate(end_idx) if end_idx else np.empty(0, dtype=int)
+
+    return pd.DataFrame({'start_name': np.asarray(names)[start_idx],
+                         'end_name': np.asarray(names)[end_idx],
+                         'score': np.concatenate(scores) if scores else np.empty(0),
+                         'pvalue': np.concatenate(pvalues) if pvalues else np.empty(0)})
+
+def _tiles(n_rows, n_cols, upper=False, size=512):
+    # Row and column slices covering an n_rows x n_cols matrix. With upper set, only tiles on or above the diagonal of a
+    # square matrix are returned.
+
+    tiles = []
+
+    for row_start in range(0, n_rows, size):
+        for col_start in range(row_start if upper else 0, n_cols, size):
+            tiles.append((slice(row_start, min(row_start + size, n_rows)), slice(col_start, min(col_start + size, n_cols))))
+
+    return tiles
+
+def _tileSize(n_features, n_jobs):
+    # Tiles are kept small enough to give every process several tiles to work on
+
+    if n_jobs == 1:
+        return 512
+
+    return int(min(512, max(64, np.ceil(n_features / (2 * n_jobs)))))
+
+def _computeTiles(data, method, tiles, n_jobs=1, progress=True, pvalues=True):
+    # Yields (rows, cols, corr, pval) for each tile. With more than one job the tiles are sent to a process pool, whose
+    # workers read the prepared data from shared memory, so only the tile slices and their results are pickled. A
+    # bounded number of tiles is kept in flight, so results are not held in memory faster than they are consumed.
+
+    if n_jobs == 1:
+        for rows, cols in tqdm(tiles, disable=not progress):
+            yield (rows, cols) + _corrTile(data, method, rows, cols, pvalues)
+        return
+
+    blocks = {}
+
+    try:
+        for key, array in data.items():
+            blocks[key] = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=blocks[key].buf)[...] = array
+
+        specs = {key: (blocks[key].name, array.shape, array.dtype.str) for key, array in data.items()}
+
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=__attachSharedData, initargs=(specs,)) as pool:
+
+            progress = tqdm(total=len(tiles), disable=not progress)
+            pending = set()
+
+            for rows, cols in tiles:
+                pending.add(pool.submit(__corrTileWorker, method, rows, cols, pvalues))
+
+                if len(pending) >= 2 * n_jobs:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+                    for future in done:
+                        progress.update()
+                        yield future.result()
+
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    progress.update()
+                    yield future.result()
+
+            progress.close()
+    finally:
+        for block in blocks.values():
+            block.close()
+            block.unlink()
+
+__workerData = {}
+__workerBlocks = []
+
+def __attachSharedData(specs):
+    # Process pool initialiser. Maps the prepared data in shared memory into numpy arrays without copying.
+
+    for key, (name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=name)
+
+        __workerBlocks.append(block)
+        __workerData[key] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+def __corrTileWorker(method, rows, cols, pvalues):
+
+    return (rows, cols) + _corrTile(__workerData, method, rows, cols, pvalues)
+
+def _prepareData(X, method):
+    # Transforms the data once for the chosen correlation type, so that any tile can be computed from it: scaled values
+    # for Pearson, scaled ranks (plus dense ranks for re-ranking pairs) for Spearman and dense ranks for Kendall.
+
+    if method == "pearson":
+        Z, M = _standardise(X)
+        return {'Z': Z, 'M': M}
+    elif method == "spearman":
+        Z, M = _standardise(_rankColumns(X))
+        return {'Z': Z, 'M': M, 'D': _denseRanks(X)}
+    else:
+        return {'D': _denseRanks(X)}
+
+def _corrTile(data, method, rows, cols, pvalues=True):
+    # Correlation coefficients and pvalues between the columns selected by rows and cols. A tile on the diagonal
+    # (rows == cols) is computed once per pair and returned symmetric. The pvalues can be skipped where only the
+    # coefficients are needed, except for Kendall's tau whose pvalues come with the coefficients.
+
+    diagonal = rows == cols
+
+    if method == "kendalltau":
+        return _kendallKernel(data['D'][:, rows], data['D'][:, cols], upper=diagonal)
+
+    Z = data['Z']
+    M = data['M']
+
+    corr, n = _pearsonKernel(Z[:, rows], M[:, rows], Z[:, cols], M[:, cols])
+
+    if method == "spearman":
+        corr = _rankCorrCorrection(data['D'][:, rows], M[:, rows], data['D'][:, cols], M[:, cols], corr, n,
+                                   upper=diagonal)
+
+    return corr, _corrPvalue(corr, n) if pvalues else None
+
+def _standardise(X):
+    # Centres and scales each column on its observed values. Missing values are set to zero and returned as a mask,
+    # so that the pairwise complete sums can be taken with matrix products.
+
+    M = (~np.isnan(X)).astype(float)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        count = M.sum(axis=0)
+        mean = np.nansum(X, axis=0) / count
+        Z = np.where(M > 0, X - mean, 0.0)
+        scale = np.sqrt((Z ** 2).sum(axis=0) / count)
+
+    scale[~(scale > 0)] = 1.0
+
+    return Z / scale, M
+
+def _pearsonKernel(Za, Ma, Zb, Mb):
+    # Pearson coefficients between the columns of Za and Zb, with the number of pairwise complete observations.
+
+    if Ma.all() and Mb.all():
+        # No missing values, so every pair shares the same centring and the coefficients are the scaled products
+        n = np.full((Za.shape[1], Zb.shape[1]), float(Za.shape[0]))
+
+        var_x = (Za ** 2).sum(axis=0)
+        var_y = (Zb ** 2).sum(axis=0)
+
+        corr = Za.T @ Zb
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr /= np.sqrt(var_x)[:, None]
+            corr /= np.sqrt(var_y)[None, :]
+
+        if not ((var_x > 0).all() and (var_y > 0).all() and Za.shape[0] >= 2):
+            corr[~((var_x[:, None] > 0) & (var_y[None, :] > 0) & (n >= 2))] = np.nan
+
+        return np.clip(corr, -1.0, 1.0, out=corr), n
+
+    n = Ma.T @ Mb
+
+    sx = Za.T @ Mb
+    sy = Ma.T @ Zb
+    sxx = (Za ** 2).T @ Mb
+    syy = Ma.T @ (Zb ** 2)
+
+    sxy = Za.T @ Zb
+
+    return _momentsToCorr(n, sx, sy, sxx, syy, sxy), n
+
+def _momentsToCorr(n, sx, sy, sxx, syy, sxy):
+    # Pearson coefficients from the pairwise sums, counts and cross-products of two sets of columns.
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = sxy - sx * sy / n
+        var_x = sxx - sx ** 2 / n
+        var_y = syy - sy ** 2 / n
+
+        corr = cov / np.sqrt(var_x * var_y)
+
+    # Constant columns and pairs with fewer than two observations have no defined coefficient
+    corr[~((var_x > 0) & (var_y > 0) & (n >= 2))] = np.nan
+
+    return np.clip(corr, -1.0, 1.0)
+
+def _rankColumns(X):
+    # Average ranks of each column over its observed values, with missing values left in place.
+
+    return pd.DataFrame(X).rank(axis=0, method='average').values
+
+def _rankCorrCorrection(Da, Ma, Db, Mb, corr, n, upper=False):
+    # Recomputes rank coefficients for pairs observed on fewer samples than either column, by ranking each pair on
+    # its common observations. Pairs sharing the same missing values already have exact ranks. The pairs are
+    # re-ranked in batches from the dense ranks of each column. With upper set, the columns of a and b are the same
+    # and only pairs above the diagonal are recomputed, then mirrored.
+
+    mismatch = (n < Ma.sum(axis=0)[:, None]) | (n < Mb.sum(axis=0)[None, :])
+
+    if upper:
+        mismatch = np.triu(mismatch, 1)
+
+    a_idx, b_idx = np.nonzero(mismatch)
+
+    batch = max(1, 2 ** 22 // max(Da.shape[0], 1))
+
+    for start in range(0, len(a_idx), batch):
+
+        a = a_idx[start:start + batch]
+        b = b_idx[start:start + batch]
+
+        common = (Ma[:, a] > 0) & (Mb[:, b] > 0)
+
+        x = np.where(common, __subsetRanks(Da[:, a], common), 0.0)
+        y = np.where(common, __subsetRanks(Db[:, b], common), 0.0)
+
+        corr[a, b] = _momentsToCorr(common.sum(axis=0), x.sum(axis=0), y.sum(axis=0), (x ** 2).sum(axis=0),
+                                    (y ** 2).sum(axis=0), (x * y).sum(axis=0))
+
+        if upper:
+            corr[b, a] = corr[a, b]
+
+    return corr
+
+def __subsetRanks(D, common):
+    # Average ranks of each column of dense ranks D over the rows flagged in common only. Rows are counted per dense
+    # rank and column, so the ranks below and tied with each value are found without sorting again.
+
+    n_rows, n_cols = D.shape
+
+    group = np.where(common, D, n_rows) + np.arange(n_cols)[None, :] * (n_rows + 1)
+
+    counts = np.bincount(group.ravel(), minlength=n_cols * (n_rows + 1))
+    below = np.cumsum(counts.reshape(n_cols, n_rows + 1), axis=1).ravel() - counts
+
+    return below[group] + (counts[group] + 1) / 2
+
+def _denseRanks(X):
+    # Dense integer ranks (starting at zero) of each column over its observed values, with -1 for missing values.
+
+    D = pd.DataFrame(X).rank(axis=0, method='dense').values - 1
+
+    return np.where(np.isnan(D), -1, D).astype(np.int64)
+
+def _kendallKernel(Da, Db, upper=False):
+    # Kendall's tau-b and pvalues between the columns of Da and Db, given dense ranks from _denseRanks. For each column
+    # of Da the rows are sorted on (x, y) against all columns of Db at once, and the discordant pairs are counted as
+    # the inversions left in y with a merge sort (Knight's algorithm). Missing rows are moved to the end of each pair.
+    # With upper set, Da and Db hold the same columns and each pair is only counted once, then mirrored.
+
+    n_rows = Da.shape[0]
+
+    tau = np.full((Da.shape[1], Db.shape[1]), np.nan)
+    pval = np.full((Da.shape[1], Db.shape[1]), np.nan)
+
+    for a_idx in range(Da.shape[1]):
+
+        b_start = a_idx if upper else 0
+
+        x = Da[:, a_idx][:, None]
+        valid = (x >= 0) & (Db[:, b_start:] >= 0)
+
+        x = np.where(valid, x, n_rows)
+        y = np.where(valid, Db[:, b_start:], n_rows)
+
+        order = np.argsort(x * (n_rows + 1) + y, axis=0, kind='stable')
+        x = np.take_along_axis(x, order, axis=0)
+        y = np.take_along_axis(y, order, axis=0)
+
+        size = valid.sum(axis=0)
+        valid = np.arange(n_rows)[:, None] < size[None, :]
+
+        dis = __countInversions(y)
+
+        ntie, _, _ = __tieCounts(valid, x, y)
+        xtie, x0, x1 = __tieCounts(valid, x)
+        ytie, y0, y1 = __tieCounts(valid, np.sort(y, axis=0))
+
+        tau[a_idx, b_start:], pval[a_idx, b_start:] = __kendallTau(size, dis, ntie, xtie, ytie, x0, y0, x1, y1)
+
+    if upper:
+        lower = np.tril_indices(Da.shape[1], -1)
+        tau[lower] = tau.T[lower]
+        pval[lower] = pval.T[lower]
+
+    return tau, pval
+
+def __countInversions(Y, base=8):
+    # Number of pairs a < b with Y[a] > Y[b] in each column, by a bottom-up merge sort over all columns at once.
+    # Runs of `base` rows are counted directly, then each merge adds, for every element of the right run, the
+    # elements of the left run not yet merged ahead of it.
+
+    n_rows, n_cols = Y.shape
+
+    length = max(1 << max(n_rows - 1, 0).bit_length(), base)
+
+    # Padding with a value above every rank adds no inversions
+    runs = np.full((n_cols, length), int(Y.max(initial=0)) + 1, dtype=np.int64)
+    runs[:, :n_rows] = Y.T
+
+    blocks = runs.reshape(n_cols, -1, base)
+    upper = np.triu(np.ones((base, base), dtype=bool), 1)
+
+    inversions = ((blocks[..., :, None] > blocks[..., None, :]) & upper).sum(axis=(1, 2, 3))
+
+    runs = np.sort(blocks, axis=-1).reshape(n_cols, length)
+    width = base
+
+    while width < length:
+        blocks = runs.reshape(n_cols, -1, 2 * width)
+
+        perm = np.argsort(blocks, axis=-1, kind='stable')
+
+        from_right = perm >= width
+        left_merged = np.cumsum(~from_right, axis=-1)
+
+        inversions += np.where(from_right, width - left_merged, 0).sum(axis=(1, 2))
+
+        runs = np.take_along_axis(blocks, perm, axis=-1).reshape(n_cols, length)
+        width *= 2
+
+    return inversions
+
+def __tieCounts(valid, *keys):
+    # Tie statistics for each column of sorted keys: the number of tied pairs, and the sums of t(t-1)(t-2) and
+    # t(t-1)(2t+5) over the tie groups, as used by the tau-b coefficient and its variance.
+
+    n_rows, n_cols = valid.shape
+
+    start = np.zeros(valid.shape, dtype=bool)
+    start[0] = True
+
+    for key in keys:
+        start[1:] |= key[1:] != key[:-1]
+
+    run = np.cumsum(start, axis=0) - 1 + np.arange(n_cols)[None, :] * n_rows
+
+    t = np.bincount(run[valid], minlength=n_rows * n_cols).reshape(n_cols, n_rows).astype(float)
+
+    return ((t * (t - 1) / 2).sum(axis=1),
+            (t * (t - 1) * (t - 2)).sum(axis=1),
+            (t * (t - 1) * (2 * t + 5)).sum(axis=1))
+
+def __kendallTau(size, dis, ntie, xtie, ytie, x0, y0, x1, y1):
+    # Tau-b coefficients and two-sided pvalues from the pair counts. Pvalues follow scipy.stats.kendalltau: exact
+    # for untied data with at most 33 observations (or at most one (dis)concordant pair), otherwise the normal
+    # approximation with the variance corrected for ties.
+
+    size = size.astype(float)
+    tot = size * (size - 1) / 2
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        con_minus_dis = tot - xtie - ytie + ntie - 2 * dis
+        tau = np.clip(con_minus_dis / np.sqrt(tot - xtie) / np.sqrt(tot - ytie), -1.0, 1.0)
+
+        m = size * (size - 1)
+        var = (m * (2 * size + 5) - x1 - y1) / 18 + (2 * xtie * ytie) / m + x0 * y0 / (9 * m * (size - 2))
+        pval = 2 * stats.norm.sf(np.abs(con_minus_dis) / np.sqrt(var))
+
+    c = np.minimum(dis, tot - dis).astype(np.int64)
+    untied = (xtie == 0) & (ytie == 0)
+
+    small = untied & (size <= 33)
+    if small.any():
+        cdf = __kendallExactCdf(int(size[small].max()))
+        pval[small] = 2 * cdf[size[small].astype(np.int64), c[small]]
+
+    extreme = untied & (size > 33) & (c <= 1)
+    if extreme.any():
+        pval[extreme] = 2 * np.exp(-special.gammaln(size[extreme] + 1)) * np.where(c[extreme] == 1, size[extreme], 1)
+
+    # Pairs with fewer than two distinct values on either side have no defined coefficient
+    undefined = (xtie == tot) | (ytie == tot)
+    tau[undefined] = np.nan
+    pval[undefined] = np.nan
+
+    return tau, np.clip(pval, 0.0, 1.0)
+
+def __kendallExactCdf(max_size):
+    # Cumulative null distribution of the number of inversions in a random permutation, cdf[n, c] = P(inversions <= c),
+    # for every n up to max_size.
+
+    max_count = max_size * (max_size - 1) // 2
+
+    cdf = np.ones((max_size + 1, max_count + 1))
+
+    prob = np.zeros(max_count + 1)
+    prob[0] = 1.0
+
+    for n in range(2, max_size + 1):
+        cumulative = np.cumsum(prob)
+        prob = cumulative.copy()
+        prob[n:] -= cumulative[:-n]
+        prob /= n
+
+        cdf[n] = np.cumsum(prob)
+
+    return cdf
+
+def _corrPvalue(corr, n):
+    # Two-sided pvalues for correlation coefficients from the t-distribution with n-2 degrees of freedom.
+
+    df = n - 2.0
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t = np.abs(corr) * np.sqrt(df / ((1.0 - corr) * (1.0 + corr)))
+        pval = 2 * stats.t.sf(t, df)
+
+    # Two observations always lie on a straight line, so the coefficient carries no evidence
+    pval = np.where(n == 2, 1.0, pval)
+    pval[np.isnan(corr) | (n < 2)] = np.nan
+
+    return pval
+
+def __checkData(df_data, correlationType, n_jobs, memmap_dir, threshold, filter_type, permutations, early_stop):
 
     if correlationType.lower() not in ["pearson", "spearman", "kendalltau"]:
         print("Error: Correlation type not valid. Choose either \"Pearson\", \"Spearman\" or \"KendallTau\".")
@@ -69,4 +627,45 @@ def __checkData(df_data, correlationType):
         print("Error: A dataframe was not entered. Please check your data.")
         sys.exit()
 
-    return df_data, correlationType
\ No newline at end of file
+    if not isinstance(n_jobs, int) or isinstance(n_jobs, bool) or (n_jobs < 1 and n_jobs != -1):
+        print("Error: Number of jobs is not valid. Choose a positive integer, or -1 to use all cores.")
+        sys.exit()
+
+    if n_jobs == -1:
+        n_jobs = os.cpu_count() or 1
+
+    if memmap_dir is not None:
+        if not isinstance(memmap_dir, str):
+            print("Error: Memory map directory is not valid. Choose a string value.")
+            sys.exit()
+
+        os.makedirs(memmap_dir, exist_ok=True)
+
+    if threshold is not None:
+        if isinstance(threshold, bool) or not isinstance(threshold, (float, int)):
+            print("Error: Threshold is not valid. Choose a float or integer value.")
+            sys.exit()
+
+        if memmap_dir is not None:
+            print("Error: A threshold and memory map directory cannot both be set. The thresholded pairs are held in memory.")
+            sys.exit()
+
+    if filter_type.lower() not in ["pvalue", "score"]:
+        print("Error: Filter type not valid. Choose either \"Pvalue\" or \"Score\".")
+        sys.exit()
+
+    if permutations is not None:
+        if not isinstance(permutations, int) or isinstance(permutations, bool) or permutations < 1:
+            print("Error: Number of permutations is not valid. Choose a positive integer.")
+            sys.exit()
+
+        if threshold is not None or memmap_dir is not None:
+            print("Error: Permutation pvalues cannot be combined with a threshold or memory map directory.")
+            sys.exit()
+
+    if early_stop is not None:
+        if not isinstance(early_stop, int) or isinstance(early_stop, bool) or early_stop < 1:
+            print("Error: Early stop is not valid. Choose a positive integer.")
+            sys.exit()
+
+    return df_data, correlationType, n_jobs, memmap_dir, threshold, filter_type, permutations, early_stop
@@ -0,0 +1,129 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+from .corrAnalysis import _prepareData, _tiles, _tileSize, _computeTiles
+
+def crossCorrAnalysis(df_data, correlationType, df_other=None, peaktable=None, n_jobs=1):
+    """Performs correlation analysis between two sets of variables, computing only the rectangular matrix of
+    correlations between them rather than the full square matrix.
+
+        Parameters
+        ----------
+        df_data : A Pandas dataframe matrix of values
+        correlationType : The correlation type to apply. Either 'Pearson', 'Spearman' or 'KendallTau'
+        df_other : A Pandas dataframe matrix of values for the same samples, whose columns are correlated with the columns of df_data (default: None)
+        peaktable : A Peak Table with a 'Block' column (e.g. from mergeBlocks), used when df_other is None. The columns of df_data in each block are correlated with those of every later block (default: None)
+        n_jobs : The number of processes to compute the correlation matrix with, in tiles. Setting to -1 uses all cores (default: 1)
+
+        Returns
+        -------
+        df_corr : Pandas dataframe matrix of correlation coefficients, with df_data columns as rows and df_other columns as columns. With a peaktable, a dictionary of these matrices indexed by (block, block) pair.
+        df_pval : Pandas dataframe matrix of correlation pvalues, with df_data columns as rows and df_other columns as columns. With a peaktable, a dictionary of these matrices indexed by (block, block) pair.
+    """
+
+    df_data, correlationType, df_other, panels, n_jobs = __checkData(df_data, correlationType, df_other, peaktable, n_jobs)
+
+    method = correlationType.lower()
+
+    if df_other is not None:
+        names = list(df_data.columns) + list(df_other.columns)
+        X = np.hstack([df_data.values, df_other.values])
+        panels = {None: (list(df_data.columns), list(df_other.columns))}
+    else:
+        names = list(df_data.columns)
+        X = df_data.values
+
+    data = _prepareData(X, method)
+
+    positions = pd.Index(names)
+
+    corr_panels = {}
+    pval_panels = {}
+
+    for key, (row_names, column_names) in panels.items():
+
+        row_start = positions.get_loc(row_names[0])
+        column_start = positions.get_loc(column_names[0]) if df_other is None else len(row_names)
+
+        corr = np.empty((len(row_names), len(column_names)))
+        pval = np.empty((len(row_names), len(column_names)))
+
+        tiles = [(slice(rows.start + row_start, rows.stop + row_start), slice(cols.start + column_start, cols.stop + column_start))
+                 for rows, cols in _tiles(len(row_names), len(column_names), size=_tileSize(max(corr.shape), n_jobs))]
+
+        for rows, cols, tile_corr, tile_pval in _computeTiles(data, method, tiles, n_jobs):
+
+            rows = slice(rows.start - row_start, rows.stop - row_start)
+            cols = slice(cols.start - column_start, cols.stop - column_start)
+
+            corr[rows, cols] = tile_corr
+            pval[rows, cols] = tile_pval
+
+        corr_panels[key] = pd.DataFrame(corr, index=row_names, columns=column_names)
+        pval_panels[key] = pd.DataFrame(pval, index=row_names, columns=column_names)
+
+    if df_other is not None:
+        return corr_panels[None], pval_panels[None]
+
+    return corr_panels, pval_panels
+
+def __checkData(df_data, correlationType, df_other, peaktable, n_jobs):
+
+    if not isinstance(df_data, pd.DataFrame):
+        print("Error: A dataframe was not entered. Please check your data.")
+        sys.exit()
+
+    if correlationType.lower() not in ["pearson", "spearman", "kendalltau"]:
+        print("Error: Correlation type not valid. Choose either \"Pearson\", \"Spearman\" or \"KendallTau\".")
+        sys.exit()
+
+    if not isinstance(n_jobs, int) or isinstance(n_jobs, bool) or (n_jobs < 1 and n_jobs != -1):
+        print("Error: Number of jobs is not valid. Choose a positive integer, or -1 to use all cores.")
+        sys.exit()
+
+    if n_jobs == -1:
+        n_jobs = os.cpu_count() or 1
+
+    panels = {}
+
+    if df_other is not None:
+        if not isinstance(df_other, pd.DataFrame):
+            print("Error: The other data is not a dataframe. Please check your data.")
+            sys.exit()
+
+        if set(df_data.index) != set(df_other.index) or len(df_data.index) != len(df_other.index):
+            print("Error: The two dataframes do not contain the same samples (index). Please check your data.")
+            sys.exit()
+
+        if set(df_data.columns).intersection(df_other.columns):
+            print("Error: The two dataframes share column names. Column names must be unique across both dataframes.")
+            sys.exit()
+
+        df_other = df_other.reindex(df_data.index).astype(float)
+    else:
+        if not isinstance(peaktable, pd.DataFrame):
+            print("Error: Either another dataframe or a Peak Table with a \"Block\" column is required.")
+            sys.exit()
+
+        if "Name" not in peaktable.columns or "Block" not in peaktable.columns:
+            print("Error: The Peak Table must contain \"Name\" and \"Block\" columns. Please check your data.")
+            sys.exit()
+
+        peaks = peaktable[peaktable['Name'].isin(df_data.columns)]
+        blocks = list(peaks['Block'].unique())
+
+        if len(blocks) < 2:
+            print("Error: At least two blocks are needed to correlate between blocks. Please check your data.")
+            sys.exit()
+
+        block_names = {block: list(peaks[peaks['Block'] == block]['Name']) for block in blocks}
+
+        # The columns are ordered by block, so that every block occupies a contiguous range of the prepared data
+        df_data = df_data[[name for block in blocks for name in block_names[block]]]
+
+        for idx, row_block in enumerate(blocks):
+            for column_block in blocks[idx + 1:]:
+                panels[(row_block, column_block)] = (block_names[row_block], block_names[column_block])
+
+    return df_data.astype(float), correlationType, df_other, panels, n_jobs
@@ -0,0 +1,136 @@
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+from .lazyMatrix import lazyMatrix
+
+def _fingerprint(*objects):
+    # Returns a hex digest of the peak table, score/pvalue matrices (dataframes, lazyMatrix handles or dictionaries of
+    # panels) and parameters passed in. A lazyMatrix is fingerprinted by its file (name, size and modification time)
+    # and its row and column names, so its values are not read.
+
+    digest = hashlib.blake2b(digest_size=20)
+
+    for obj in objects:
+        __update(digest, obj)
+
+    return digest.hexdigest()
+
+def _loadCache(cache_dir, key):
+    # Returns the cached (nodes, edges) for the key, or None if not cached. A hit marks the entry as recently used.
+
+    filename = os.path.join(cache_dir, key + '.npz')
+
+    if not os.path.isfile(filename):
+        return None
+
+    with np.load(filename, allow_pickle=False) as arrays:
+        meta = json.loads(str(arrays['meta']))
+
+        nodes = __arraysToFrame(arrays, 'nodes', meta['nodes'])
+        edges = __arraysToFrame(arrays, 'edges', meta['edges'])
+
+    os.utime(filename)
+
+    return nodes, edges
+
+def _saveCache(cache_dir, key, nodes, edges, cache_size):
+    # Saves the nodes and edges for the key, then removes the least recently used entries until the cache holds at
+    # most cache_size MB
+
+    arrays = {}
+    meta = {'nodes': __frameToArrays(nodes, 'nodes', arrays), 'edges': __frameToArrays(edges, 'edges', arrays)}
+    arrays['meta'] = np.array(json.dumps(meta))
+
+    # Written to a temporary file first, so an interrupted write does not leave a partial entry
+    filename = os.path.join(cache_dir, key + '.npz')
+    tmp_filename = os.path.join(cache_dir, key + '.tmp.npz')
+
+    np.savez(tmp_filename, **arrays)
+    os.replace(tmp_filename, filename)
+
+    entries = [os.path.join(cache_dir, x) for x in os.listdir(cache_dir) if x.endswith('.npz') and not x.endswith('.tmp.npz')]
+    entries = sorted(entries, key=os.path.getmtime)
+
+    total = sum(os.path.getsize(x) for x in entries)
+
+    while entries and total > cache_size * 2 ** 20:
+        oldest = entries.pop(0)
+        total -= os.path.getsize(oldest)
+        os.remove(oldest)
+
+def __update(digest, obj):
+
+    if isinstance(obj, dict):
+        digest.update(b'dict')
+        for key in obj:
+            __update(digest, key)
+            __update(digest, obj[key])
+    elif isinstance(obj, pd.DataFrame):
+        digest.update(b'frame')
+        __update(digest, list(obj.index))
+        __update(digest, list(obj.columns))
+        __update(digest, [str(x) for x in obj.dtypes])
+
+        for column in range(obj.shape[1]):
+            values = obj.iloc[:, column]
+
+            if values.dtype.kind in 'biuf':
+                digest.update(np.ascontiguousarray(values.values))
+            else:
+                digest.update(pd.util.hash_pandas_object(values, index=False).values)
+    elif isinstance(obj, lazyMatrix):
+        stat = os.stat(obj.getFilename())
+        digest.update(b'lazy')
+        __update(digest, [os.path.realpath(obj.getFilename()), stat.st_size, stat.st_mtime_ns])
+        __update(digest, list(obj.index))
+        __update(digest, list(obj.columns))
+    else:
+        digest.update(repr(obj).encode())
+
+def __frameToArrays(df, prefix, arrays):
+    # Each column is stored as its own array. Categoricals are stored as codes and categories, and other non-numeric
+    # columns as strings, so the file is read without pickle.
+
+    columns = []
+
+    for idx, column in enumerate(df.columns):
+
+        values = df[column]
+        name = '{}_{}'.format(prefix, idx)
+
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            arrays[name] = values.cat.codes.values
+            categories = np.asarray(values.cat.categories)
+            arrays[name + '_categories'] = categories if categories.dtype.kind in 'biuf' else categories.astype(str)
+            kind = 'category'
+        elif values.dtype.kind in 'biuf':
+            arrays[name] = values.values
+            kind = 'numeric'
+        else:
+            arrays[name] = np.asarray(values).astype(str)
+            kind = str(values.dtype)
+
+        columns.append([str(column), kind])
+
+    arrays[prefix + '_index'] = np.asarray(df.index)
+
+    return columns
+
+def __arraysToFrame(arrays, prefix, columns):
+
+    data = {}
+
+    for idx, (column, kind) in enumerate(columns):
+
+        name = '{}_{}'.format(prefix, idx)
+
+        if kind == 'category':
+            data[column] = pd.Categorical.from_codes(arrays[name], categories=arrays[name + '_categories'])
+        elif kind == 'numeric':
+            data[column] = arrays[name]
+        else:
+            data[column] = pd.Series(arrays[name]).astype(kind).values
+
+    return pd.DataFrame(data, index=arrays[prefix + '_index'])
@@ -0,0 +1,237 @@
+import numpy as np
+import networkx as nx
+import scipy.sparse as sp
+
+def _fastSpring(g, seed=0, theta=1.2, iterations=50):
+    # Returns a dictionary of node positions (scaled to [-1, 1], as with the NetworkX layouts) from a multilevel
+    # Fruchterman-Reingold layout. The graph is coarsened by matching each node with its most strongly connected
+    # neighbour, the coarsest graph is laid out from random positions and each finer graph starts from the positions
+    # of the coarser one. Repulsion between nodes is approximated with a Barnes-Hut quadtree, so each iteration is
+    # O(N log N) rather than O(N^2). The absolute edge weights are used as the spring strengths.
+
+    nodes = list(g.nodes())
+    n = len(nodes)
+
+    if n == 1:
+        return {nodes[0]: np.zeros(2)}
+
+    rng = np.random.default_rng(seed)
+
+    adjacency = abs(nx.to_scipy_sparse_array(g, nodelist=nodes, weight='weight', format='csr'))
+    adjacency = (adjacency + adjacency.T) / 2
+    adjacency.setdiag(0)
+    adjacency.eliminate_zeros()
+
+    if adjacency.nnz > 0:
+        adjacency = adjacency / adjacency.data.mean()
+
+    levels = __coarsenLevels(sp.csr_matrix(adjacency), np.ones(n), rng)
+
+    pos = rng.uniform(-1, 1, (len(levels[-1][1]), 2)) * np.sqrt(n)
+
+    for idx in range(len(levels) - 1, -1, -1):
+        adjacency, mass, labels = levels[idx]
+
+        # The finer graphs start close to their final layout, so larger ones are given fewer iterations. The
+        # temperature is the typical distance between the nodes of each graph, whose masses are the number of nodes
+        # merged into them. The coarsest graph starts from random positions, so is given more of both.
+        if idx == len(levels) - 1:
+            steps, temperature = iterations, max(np.sqrt(n / len(mass)), np.sqrt(n) / 10)
+        else:
+            steps, temperature = int(np.clip(30 * np.sqrt(1000 / len(mass)), 8, iterations)), np.sqrt(n / len(mass))
+
+        pos = __forceLayout(pos, adjacency, mass, rng, theta, steps, temperature)
+
+        # Nodes merged into the same coarse node start at its position, spread out slightly
+        if labels is not None:
+            pos = pos[labels] + rng.uniform(-0.1, 0.1, (len(labels), 2))
+
+    pos = nx.rescale_layout(pos)
+
+    return dict(zip(nodes, pos))
+
+def __coarsenLevels(adjacency, mass, rng, min_nodes=50, min_reduction=0.1):
+    # Returns a list of (adjacency, mass, labels) from the finest to the coarsest graph, where the labels map the nodes
+    # of the finer graph to those of the coarser one
+
+    levels = [(adjacency, mass, None)]
+
+    while len(mass) > min_nodes:
+        labels = __matchNodes(adjacency, mass, rng)
+        n_coarse = labels.max() + 1
+
+        if n_coarse > (1 - min_reduction) * len(mass):
+            break
+
+        # Edge weights between merged nodes are summed, and the masses count the nodes merged into each coarse node
+        restriction = sp.csr_matrix((np.ones(len(labels)), (np.arange(len(labels)), labels)), shape=(len(labels), n_coarse))
+        adjacency = sp.csr_matrix(restriction.T @ adjacency @ restriction)
+        adjacency.setdiag(0)
+        adjacency.eliminate_zeros()
+        mass = np.bincount(labels, weights=mass, minlength=n_coarse)
+
+        levels.append((adjacency, mass, labels))
+
+    return levels
+
+def __matchNodes(adjacency, mass, rng, rounds=20):
+    # Returns the coarse node of each node. In each round, every unmatched node picks the unmatched neighbour it is
+    # most strongly connected to (relative to their masses, so clusters stay balanced) and mutual picks are merged.
+
+    n = len(mass)
+    partner = np.full(n, -1)
+
+    coo = adjacency.tocoo()
+    rows, cols = coo.row, coo.col
+
+    # Ties are broken at random, by the same amount in both directions so each edge has a single score
+    noise = rng.uniform(0, 0.005, n)
+    score = coo.data / (mass[rows] * mass[cols]) * (1 + noise[rows] + noise[cols])
+
+    for _ in range(rounds):
+        free = (partner[rows] < 0) & (partner[cols] < 0)
+
+        if not free.any():
+            break
+
+        r, c, s = rows[free], cols[free], score[free]
+
+        order = np.lexsort((-s, r))
+        r, c = r[order], c[order]
+        first = np.r_[True, r[1:] != r[:-1]]
+
+        best = np.full(n, -1)
+        best[r[first]] = c[first]
+
+        picked = np.flatnonzero(best >= 0)
+        mutual = picked[best[best[picked]] == picked]
+
+        if len(mutual) == 0:
+            break
+
+        partner[mutual] = best[mutual]
+
+    # Each pair takes the label of its lower node, and unmatched nodes are kept on their own
+    leader = np.where((partner >= 0) & (partner < np.arange(n)), partner, np.arange(n))
+    _, labels = np.unique(leader, return_inverse=True)
+
+    return labels
+
+def __forceLayout(pos, adjacency, mass, rng, theta, iterations, temperature, gravity=0.1):
+    # Fruchterman-Reingold iterations with an optimal distance of 1. Each node moves along its net force by at most
+    # the temperature, which cools linearly. A weak pull to the centre keeps disconnected components close.
+
+    upper = sp.triu(adjacency, k=1).tocoo()
+    start, end, weight = upper.row, upper.col, upper.data
+
+    pos = pos.copy()
+
+    for step in range(iterations):
+        force = __repulsion(pos, mass, theta)
+
+        delta = pos[start] - pos[end]
+        distance = np.sqrt((delta ** 2).sum(axis=1))
+        attraction = delta * (distance * weight)[:, None]
+
+        for dim in range(2):
+            force[:, dim] -= np.bincount(start, weights=attraction[:, dim], minlength=len(pos))
+            force[:, dim] += np.bincount(end, weights=attraction[:, dim], minlength=len(pos))
+
+        force -= gravity * mass[:, None] * pos
+
+        length = np.sqrt((force ** 2).sum(axis=1))
+        length[length == 0] = 1
+        t = temperature * (1 - step / iterations)
+
+        pos += force * (np.minimum(length, t) / length)[:, None]
+
+        # Nodes at the same position are separated, as the forces between them have no direction
+        if step == 0:
+            pos += rng.uniform(-1e-3, 1e-3, pos.shape)
+
+    return pos
+
+def __repulsion(pos, mass, theta, min_distance=0.01):
+    # Returns the repulsive force on each node, of size mass / distance from every other node. The nodes are placed in
+    # a quadtree of Morton-coded cells, and the tree is walked for all nodes at once: a cell holding a single node, or
+    # far enough away (cell width < theta * distance), acts as a single mass at its centroid, otherwise it is opened
+    # into its child cells. At the deepest level the remaining cells are used as single masses, without the node itself.
+
+    n = len(pos)
+    depth = int(min(15, np.ceil(np.log2(max(np.sqrt(n), 2))) + 2))
+
+    x, y = pos[:, 0], pos[:, 1]
+
+    low = pos.min(axis=0)
+    width = max((pos.max(axis=0) - low).max(), 1e-9) * (1 + 1e-9)
+    grid = np.minimum(((pos - low) / width * 2 ** depth).astype(np.uint64), 2 ** depth - 1)
+    codes = __spreadBits(grid[:, 0]) | (__spreadBits(grid[:, 1]) << np.uint64(1))
+
+    # The cells, node cells, node counts, masses and centroids at each depth
+    cells, nodeCells, cellCount, cellMass, cellX, cellY = [], [], [], [], [], []
+
+    for d in range(depth + 1):
+        unique, inverse = np.unique(codes >> np.uint64(2 * (depth - d)), return_inverse=True)
+        m = np.bincount(inverse, weights=mass, minlength=len(unique))
+
+        cells.append(unique)
+        nodeCells.append(inverse)
+        cellCount.append(np.bincount(inverse, minlength=len(unique)))
+        cellMass.append(m)
+        cellX.append(np.bincount(inverse, weights=mass * x, minlength=len(unique)) / m)
+        cellY.append(np.bincount(inverse, weights=mass * y, minlength=len(unique)) / m)
+
+    fx = np.zeros(n)
+    fy = np.zeros(n)
+
+    node = np.arange(n)
+    cell = np.zeros(n, dtype=np.int64)
+
+    for d in range(depth + 1):
+        inside = nodeCells[d][node] == cell
+        m = cellMass[d][cell]
+        dx = x[node] - cellX[d][cell]
+        dy = y[node] - cellY[d][cell]
+
+        if d == depth:
+            # A node's own mass is taken out of the cell holding it, which moves the centroid away from the node
+            own = np.where(inside, mass[node], 0)
+            scale = np.where(inside, m / np.maximum(m - own, 1e-12), 1)
+            dx, dy, m = dx * scale, dy * scale, m - own
+            accept = m > 1e-12
+        else:
+            accept = ~inside & ((cellCount[d][cell] == 1) | ((width / 2 ** d) ** 2 < theta ** 2 * (dx ** 2 + dy ** 2)))
+
+        push = m[accept] / np.maximum(dx[accept] ** 2 + dy[accept] ** 2, min_distance ** 2)
+
+        fx += np.bincount(node[accept], weights=dx[accept] * push, minlength=n)
+        fy += np.bincount(node[accept], weights=dy[accept] * push, minlength=n)
+
+        if d == depth:
+            break
+
+        # The opened cells are replaced by their children, which are contiguous in the sorted cells of the next depth
+        node, cell = node[~accept], cell[~accept]
+
+        parents = np.searchsorted(cells[d], cells[d + 1] >> np.uint64(2))
+        first = np.searchsorted(parents, np.arange(len(cells[d])))
+        count = np.bincount(parents, minlength=len(cells[d]))
+
+        repeats = count[cell]
+        offsets = np.arange(repeats.sum()) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+
+        node = np.repeat(node, repeats)
+        cell = np.repeat(first[cell], repeats) + offsets
+
+    return np.column_stack([fx, fy])
+
+def __spreadBits(v):
+    # Spreads the lower 16 bits of each value to the even bits, to interleave x and y into a Morton code
+
+    v = v & np.uint64(0xFFFF)
+    v = (v | (v << np.uint64(8))) & np.uint64(0x00FF00FF)
+    v = (v | (v << np.uint64(4))) & np.uint64(0x0F0F0F0F)
+    v = (v | (v << np.uint64(2))) & np.uint64(0x33333333)
+    v = (v | (v << np.uint64(1))) & np.uint64(0x55555555)
+
+    return v
@@ -0,0 +1,172 @@
+import sys
+import numpy as np
+import pandas as pd
+
+class lazyMatrix:
+    usage = """A DataFrame-like handle to a matrix stored on disk as a .npy memory map (e.g. written by corrAnalysis with
+        memmap_dir set). Values are only read when requested, a tile of rows at a time.
+
+        Initial_Parameters
+        ----------
+        filename : The .npy file containing the matrix
+        index : The row names of the matrix
+        columns : The column names of the matrix
+
+        Methods
+        -------
+        help : Print this help text
+
+        getFilename : Returns the .npy file name.
+        select : Returns a handle to a subset/reordering of rows and columns by name, without reading any values.
+        rowChunks : Yields (row start, Pandas dataframe) tiles of consecutive rows (default chunk_size: rows of ~64MB).
+        toDataFrame : Reads the whole (selected) matrix into a Pandas dataframe.
+    """
+
+    def __init__(self, filename, index, columns):
+
+        index, columns = self.__checkData(filename, index, columns)
+
+        self.__filename = filename
+        self.__array = np.load(filename, mmap_mode='r')
+        self.__index = index
+        self.__columns = columns
+        self.__row_positions = np.arange(len(index))
+        self.__column_positions = np.arange(len(columns))
+
+    def help(self):
+        print(lazyMatrix.usage)
+
+    @property
+    def index(self):
+
+        return self.__index
+
+    @property
+    def columns(self):
+
+        return self.__columns
+
+    @property
+    def shape(self):
+
+        return (len(self.__index), len(self.__columns))
+
+    @property
+    def empty(self):
+
+        return 0 in self.shape
+
+    @property
+    def values(self):
+
+        return self.__read(self.__row_positions)
+
+    def getFilename(self):
+
+        return self.__filename
+
+    def astype(self, dtype):
+        # Values are read as stored, so the handle is returned unchanged
+
+        return self
+
+    def select(self, index_names, column_names):
+
+        rows = self.__index.get_indexer(pd.Index(index_names))
+        cols = self.__columns.get_indexer(pd.Index(column_names))
+
+        if (rows < 0).any() or (cols < 0).any():
+            print("Error: Names not found in the matrix. Please check your data.")
+            sys.exit()
+
+        return self.__view(rows, cols)
+
+    def rowChunks(self, chunk_size=None):
+
+        if chunk_size is None:
+            chunk_size = max(1, 2 ** 23 // max(len(self.__columns), 1))
+
+        for start in range(0, len(self.__index), chunk_size):
+            rows = self.__row_positions[start:start + chunk_size]
+
+            yield start, pd.DataFrame(self.__read(rows), index=self.__index[start:start + chunk_size], columns=self.__columns)
+
+    def toDataFrame(self):
+
+        return pd.DataFrame(self.values, index=self.__index, columns=self.__columns)
+
+    def __getitem__(self, key):
+        # Boolean arrays select rows and lists of names select columns, as with a Pandas dataframe
+
+        if isinstance(key, (np.ndarray, pd.Series, list)) and len(key) == len(self.__index) and np.asarray(key).dtype == bool:
+            rows = np.nonzero(np.asarray(key))[0]
+            return self.__view(rows, np.arange(len(self.__columns)))
+
+        if isinstance(key, (np.ndarray, pd.Series, pd.Index, list)):
+            return self.select(self.__index, key)
+
+        position = self.__columns.get_loc(key)
+
+        return pd.Series(np.asarray(self.__array[self.__row_positions, self.__column_positions[position]]), index=self.__index, name=key)
+
+    def __len__(self):
+
+        return len(self.__index)
+
+    def __read(self, rows):
+        # Reads only the selected columns of the rows, so a tile of a narrow view (e.g. one block of a multi-block
+        # matrix) holds and reads no more than its own cells. Consecutive rows or columns are read as a slice.
+
+        cols = self.__column_positions
+
+        if len(rows) == 0 or len(cols) == 0:
+            return np.empty((len(rows), len(cols)), dtype=self.__array.dtype)
+
+        row_key = self.__positionKey(rows)
+        col_key = self.__positionKey(cols)
+
+        if isinstance(row_key, slice) and isinstance(col_key, slice):
+            # A slice of a memory map is still on disk, so it is read into memory
+            return np.array(self.__array[row_key, col_key])
+
+        if isinstance(row_key, slice) or isinstance(col_key, slice):
+            return np.asarray(self.__array[row_key, col_key])
+
+        return np.asarray(self.__array[np.ix_(row_key, col_key)])
+
+    def __positionKey(self, positions):
+        # A slice for consecutive increasing positions, otherwise the positions themselves
+
+        if positions[-1] - positions[0] == len(positions) - 1 and (np.diff(positions) == 1).all():
+            return slice(int(positions[0]), int(positions[-1]) + 1)
+
+        return positions
+
+    def __view(self, rows, cols):
+
+        view = object.__new__(lazyMatrix)
+        view.__filename = self.__filename
+        view.__array = self.__array
+        view.__index = self.__index[rows]
+        view.__columns = self.__columns[cols]
+        view.__row_positions = self.__row_positions[rows]
+        view.__column_positions = self.__column_positions[cols]
+
+        return view
+
+    def __checkData(self, filename, index, columns):
+
+        if not str(filename).endswith(".npy"):
+            print("Error: {} should be a .npy file.".format(filename))
+            sys.exit()
+
+        index = pd.Index(index)
+        columns = pd.Index(columns)
+
+        shape = np.load(filename, mmap_mode='r').shape
+
+        if shape != (len(index), len(columns)):
+            print("Error: The matrix shape {} does not match the number of row and column names.".format(shape))
+            sys.exit()
+
+        return index, columns
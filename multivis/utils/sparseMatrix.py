@@ -0,0 +1,147 @@
+import sys
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+class sparseMatrix:
+    usage = """A handle to a scipy.sparse matrix of scores or pvalues with row and column names (e.g. a kNN or thresholded
+        similarity matrix), so it can be passed to Edge and Network without densifying. Only the stored entries are
+        read. For a square matrix with the same row and column names, each pair is read once from above the diagonal,
+        or from below it where only that entry is stored (e.g. from scipy.sparse.tril).
+
+        Initial_Parameters
+        ----------
+        matrix : A scipy.sparse matrix (or array)
+        index : The row names of the matrix
+        columns : The column names of the matrix
+
+        Methods
+        -------
+        help : Print this help text
+
+        getMatrix : Returns the scipy.sparse matrix in CSR format.
+        toPairs : Returns a Pandas dataframe of the stored entries, with 'start_name', 'end_name' and 'score' columns, and a 'pvalue' column read from a sparseMatrix of pvalues at the same entries (if given). Pairs without a stored pvalue are given NaN.
+        toDataFrame : Returns the whole matrix as a dense Pandas dataframe.
+    """
+
+    def __init__(self, matrix, index, columns):
+
+        matrix, index, columns = self.__checkData(matrix, index, columns)
+
+        self.__matrix = matrix
+        self.__index = index
+        self.__columns = columns
+
+    def help(self):
+        print(sparseMatrix.usage)
+
+    @property
+    def index(self):
+
+        return self.__index
+
+    @property
+    def columns(self):
+
+        return self.__columns
+
+    @property
+    def shape(self):
+
+        return (len(self.__index), len(self.__columns))
+
+    @property
+    def empty(self):
+
+        return 0 in self.shape
+
+    def getMatrix(self):
+
+        return self.__matrix
+
+    def toPairs(self, pvalues=None):
+
+        if pvalues is not None:
+            if not isinstance(pvalues, sparseMatrix) or not pvalues.index.equals(self.__index) or not pvalues.columns.equals(self.__columns):
+                print("Error: The pvalues must be a sparseMatrix with the same row and column names. Please check your data.")
+                sys.exit()
+
+        # A square matrix with the same row and column names is read as the pairs above the diagonal, as with a dense
+        # matrix, with entries stored only below the diagonal (e.g. from scipy.sparse.tril) moved above it
+        fold = self.__index.equals(self.__columns)
+
+        rows, cols, score = self.__storedEntries(self.__matrix, fold)
+
+        pairs = pd.DataFrame({'start_name': np.asarray(self.__index)[rows],
+                              'end_name': np.asarray(self.__columns)[cols],
+                              'score': score.astype(float)})
+
+        if pvalues is not None:
+            # The pvalues are matched to the stored scores, and pairs without a stored pvalue are given NaN rather than
+            # the implicit zero of a sparse matrix
+            n_columns = len(self.__columns)
+            keys = rows.astype(np.int64) * n_columns + cols
+
+            pval_rows, pval_cols, pval = self.__storedEntries(pvalues.getMatrix(), fold)
+            pval_keys = pval_rows.astype(np.int64) * n_columns + pval_cols
+
+            pairs['pvalue'] = np.nan
+
+            if len(pval_keys) > 0:
+                position = np.minimum(np.searchsorted(pval_keys, keys), len(pval_keys) - 1)
+                found = pval_keys[position] == keys
+
+                pairs.loc[found, 'pvalue'] = pval[position[found]].astype(float)
+
+        return pairs
+
+    def toDataFrame(self):
+
+        return pd.DataFrame(self.__matrix.toarray(), index=self.__index, columns=self.__columns)
+
+    def __storedEntries(self, matrix, fold):
+        # Returns the rows, columns and values of the stored entries, ordered by row then column. When folded, each
+        # entry below the diagonal is moved to its pair above it, the entry above the diagonal is kept where both are
+        # stored, and the diagonal is left out.
+
+        coo = matrix.tocoo()
+
+        rows, cols, values = coo.row, coo.col, coo.data
+
+        if fold:
+            off_diagonal = rows != cols
+            rows, cols, values = rows[off_diagonal], cols[off_diagonal], values[off_diagonal]
+
+            lower = rows > cols
+            rows, cols = np.where(lower, cols, rows), np.where(lower, rows, cols)
+
+            # The entries above the diagonal come first, so they are the ones kept
+            order = np.argsort(lower, kind='stable')
+            rows, cols, values = rows[order], cols[order], values[order]
+
+        keys = rows.astype(np.int64) * matrix.shape[1] + cols
+        _, first = np.unique(keys, return_index=True)
+
+        return rows[first], cols[first], values[first]
+
+    def __checkData(self, matrix, index, columns):
+
+        if not sp.issparse(matrix):
+            print("Error: A scipy.sparse matrix was not entered. Please check your data.")
+            sys.exit()
+
+        index = pd.Index(index)
+        columns = pd.Index(columns)
+
+        if matrix.shape != (len(index), len(columns)):
+            print("Error: The matrix shape {} does not match the number of row and column names.".format(matrix.shape))
+            sys.exit()
+
+        matrix = sp.csr_matrix(matrix)
+
+        # Duplicate entries are summed so each pair is stored once, on a copy to leave the matrix passed in unchanged
+        if not matrix.has_canonical_format:
+            matrix = matrix.copy()
+            matrix.sum_duplicates()
+
+        return matrix, index, columns